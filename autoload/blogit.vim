@@ -0,0 +1,4306 @@
+"""
+" Copyright (C) 2009-2010 Romain Bignon
+"
+" This program is free software; you can redistribute it and/or modify
+" it under the terms of the GNU General Public License as published by
+" the Free Software Foundation, version 3 of the License.
+"
+" This program is distributed in the hope that it will be useful,
+" but WITHOUT ANY WARRANTY; without even the implied warranty of
+" MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+" GNU General Public License for more details.
+"
+" You should have received a copy of the GNU General Public License
+" along with this program; if not, write to the Free Software
+" Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+"
+" Maintainer:   Romain Bignon
+" Contributor:  Adam Schmalhofer
+" URL:          http://symlink.me/wiki/blogit
+" Version:      1.4.3
+" Last Change:  2010 January 01
+
+
+" Everything in here is loaded on the first use of :Blogit (see
+" plugin/blogit.vim), so it costs nothing at Vim startup.
+
+runtime! passwords.vim
+
+let s:used_categories = []
+let s:used_tags = []
+
+function! blogit#command(bang, ...)
+    " s:variables used from python are those of this script.
+    python blogit.command(vim.eval('a:bang'), *vim.eval('a:000'))
+endfunction
+
+function! blogit#preview_changed()
+    " Re-renders the preview once typing paused for blogit_preview_delay ms.
+    if exists('b:blogit_preview_timer')
+        call timer_stop(b:blogit_preview_timer)
+    endif
+    let b:blogit_preview_timer = timer_start(
+                \ get(g:, 'blogit_preview_delay', 300),
+                \ function('blogit#preview_update', [bufnr('%')]))
+endfunction
+
+function! blogit#preview_update(bufnr, ...)
+    call blogit#command('!', 'preview_update', a:bufnr)
+endfunction
+
+function! BlogItComplete(findstart, base)
+    " based on code from :he complete-functions
+    if a:findstart
+        " locate the start of the word
+        let line = getline('.')
+        let start = col('.') - 1
+        while start > 0 && line[start - 1] =~ '\S'
+            let start -= 1
+        endwhile
+        return start
+    else
+        let sep = ', '
+        if getline('.') =~# '^Categories: '
+            let L = s:used_categories
+        elseif getline('.') =~# '^Tags: '
+            let L = s:used_tags
+        elseif getline('.') =~# '^Status: ' && exists('b:blog_post_type')
+            if b:blog_post_type == 'comments'
+                let L = [ 'approve', 'spam', 'hold', 'new', 'rm' ]
+            elseif b:blog_post_type == 'post'
+                let L = [ 'draft', 'publish', 'private', 'pending', 'new', 'rm' ]
+            else
+                let L = [ ]
+            endif
+            let sep = ''
+        else
+            return []
+        endif
+        let res = []
+        for m in L
+            if m =~ '^' . a:base
+                call add(res, m . sep)
+            endif
+        endfor
+        return res
+    endif
+endfunction
+
+function! BlogItCommentsFoldText()
+    let line_no = v:foldstart
+    if v:foldlevel > 1
+        while getline(line_no) !~ '^\s*$'
+            let line_no += 1
+        endwhile
+        let title = getline(line_no + 1)
+    else
+        let title = substitute(getline(line_no + 1), '^ *', '', '')
+    endif
+    return '+' . v:folddashes . title
+endfunction
+
+if !has('python')
+    echoerr 'Blogit needs Vim compiled with +python.'
+    finish
+endif
+
+python <<EOF
+# Lets the python unit test ignore everything above this line (docstring). """
+
+import xmlrpclib
+import sys
+import os
+import re
+import base64
+import hashlib
+import mimetypes
+import threading
+import Queue
+import zlib
+import codecs
+import collections
+import itertools
+import cPickle
+import atexit
+import shutil
+import socket
+import errno
+import random
+import httplib
+from time import mktime, strptime, strftime, localtime, gmtime, sleep, time
+from locale import getpreferredencoding
+from calendar import timegm
+from subprocess import Popen, CalledProcessError, PIPE
+from xmlrpclib import DateTime, Fault, MultiCall
+from inspect import getargspec
+import webbrowser
+import tempfile
+import warnings
+import gettext
+import urllib, urllib2
+import json
+import cgi
+import argparse
+import fnmatch
+import BaseHTTPServer
+import SocketServer
+from functools import partial
+
+gettext.textdomain('blogit')
+_ = gettext.gettext
+
+try:
+    import vim
+except ImportError:
+    if __name__ == '__main__':
+        # Run from the command line, see main(). Set to a HeadlessVim there.
+        vim = None
+        doctest = None
+    else:
+        # Used outside of vim (for testing)
+        from minimock import Mock, mock
+        import minimock
+        import doctest
+        from mock_vim import vim
+else:
+    doctest = None
+
+#warnings.simplefilter('ignore', Warning)
+warnings.simplefilter('always', UnicodeWarning)
+
+
+class BlogIt(object):
+
+    @staticmethod
+    def enc(text):
+        r""" Helper function to encode ascii or unicode strings.
+
+        Used when communicating with Vim buffers and commands.
+        """
+        try:
+            return text.encode('utf-8')
+        except UnicodeDecodeError:
+            return text
+
+
+    @staticmethod
+    def to_vim_list(L):
+        """ Helper function to encode a List for ":let L = [ 'a', 'b' ]" """
+        L = ['"%s"' % BlogIt.enc(item).replace('\\', '\\\\')
+             .replace('"', r'\"') for item in L]
+        return '[ %s ]' % ', '.join(L)
+
+
+    @staticmethod
+    def parallel_map(func, items, jobs=4):
+        """ Like map(), but calls func from up to jobs threads.
+
+        The first exception raised by func is re-raised in the caller. Never
+        call into vim from func, the vim module isn't thread safe.
+
+        >>> BlogIt.parallel_map(lambda x: x * 2, [1, 2, 3], jobs=2)
+        [2, 4, 6]
+        >>> BlogIt.parallel_map(lambda x: 1 / x, [1, 0])
+        Traceback (most recent call last):
+            ...
+        ZeroDivisionError: integer division or modulo by zero
+        """
+        items = list(items)
+        results = [None] * len(items)
+        errors = []
+        queue = Queue.Queue()
+        for i, item in enumerate(items):
+            queue.put((i, item))
+
+        def worker():
+            while not errors:
+                try:
+                    i, item = queue.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    results[i] = func(item)
+                except Exception:
+                    errors.append(sys.exc_info())
+
+        threads = [threading.Thread(target=worker)
+                   for j in range(max(1, min(jobs, len(items))))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.1)    # Without a timeout join blocks Ctrl-C.
+        except KeyboardInterrupt:
+            errors.append(sys.exc_info())    # Workers stop after their item.
+            raise
+        if errors:
+            raise errors[0][0], errors[0][1], errors[0][2]
+        return results
+
+
+    @staticmethod
+    def split_lines(chunks):
+        r""" Yields the lines (without line ends) of the text in chunks.
+
+        Like ''.join(chunks).splitlines(), without joining the chunks.
+
+        >>> list(BlogIt.split_lines(['one\ntw', 'o\n', '\nthree']))
+        ['one', 'two', '', 'three']
+        >>> list(BlogIt.split_lines(['one\n']))
+        ['one']
+        """
+        partial = []
+        for chunk in chunks:
+            lines = chunk.split('\n')
+            if len(lines) == 1:
+                partial.append(chunk)
+                continue
+            partial.append(lines[0])
+            yield ''.join(partial)
+            for line in lines[1:-1]:
+                yield line
+            partial = [lines[-1]]
+        last = ''.join(partial)
+        if last:
+            yield last
+
+
+    @staticmethod
+    def join_lines(lines):
+        r""" Yields the pieces of '\n'.join(lines) without joining them.
+
+        >>> list(BlogIt.join_lines(['one', 'two', 'three']))
+        ['one', '\ntwo', '\nthree']
+        """
+        lines = iter(lines)
+        for line in lines:
+            yield line
+            break
+        for line in lines:
+            yield '\n' + line
+
+
+    @staticmethod
+    def strip_lines(lines):
+        """ Returns lines without the blank lines at both ends.
+
+        >>> BlogIt.strip_lines(['', ' ', 'one', '', 'two', ''])
+        ['one', '', 'two']
+        """
+        start, end = 0, len(lines)
+        while start < end and lines[start].strip() == '':
+            start += 1
+        while end > start and lines[end - 1].strip() == '':
+            end -= 1
+        return lines[start:end]
+
+
+    @staticmethod
+    def pipe(command, chunks, input_text=''):
+        """ Yields the output of shell command with chunks as its input.
+
+        Chunks are written by a thread while the output is read in chunks,
+        so no pipe can fill up and block the command, whatever the size of
+        the text. Chunks are encoded to the preferred encoding one at a
+        time, the output is recoded to utf-8 chunk by chunk.
+
+        Raises FilterException (after the output) if the command fails. The
+        command is terminated if the generator is closed before the end.
+
+        >>> ''.join(BlogIt.pipe('tr a-z A-Z', ['one\\n', 'two\\n']))
+        'ONE\\nTWO\\n'
+        >>> ''.join(BlogIt.pipe('false', ['one']))
+        Traceback (most recent call last):
+            ...
+        FilterException
+        """
+        encoding = getpreferredencoding()
+        try:
+            p = Popen(command, shell=True, stdin=PIPE, stdout=PIPE,
+                      stderr=PIPE)
+        except Exception, e:
+            raise BlogIt.FilterException(unicode(e), input_text, command)
+        stderr = []
+
+        def feed():
+            try:
+                for chunk in chunks:
+                    try:
+                        p.stdin.write(chunk.encode(encoding))
+                    except UnicodeDecodeError:
+                        p.stdin.write(chunk.decode('utf-8').encode(encoding))
+            except Exception, e:
+                # EPIPE: the command didn't read all of its input, its exit
+                # status tells if that's an error.
+                if getattr(e, 'errno', None) != errno.EPIPE:
+                    stderr.append(unicode(e))
+            finally:
+                p.stdin.close()
+
+        def drain_stderr():
+            stderr.insert(0, p.stderr.read())
+
+        threads = [threading.Thread(target=feed),
+                   threading.Thread(target=drain_stderr)]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        done = False
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)()
+            while True:
+                chunk = os.read(p.stdout.fileno(), 65536)
+                if not chunk:
+                    break
+                yield decoder.decode(chunk).encode('utf-8')
+            yield decoder.decode('', True).encode('utf-8')
+            done = True
+        except Exception, e:
+            raise BlogIt.FilterException(unicode(e), input_text, command)
+        finally:
+            p.stdout.close()
+            if not done and p.poll() is None:
+                # Closed early or interrupted: the threads would wait for a
+                # command nobody reads anymore.
+                p.terminate()
+            for t in threads:
+                t.join()
+            p.wait()
+        if p.returncode:
+            raise BlogIt.FilterException(''.join(stderr), input_text, command)
+
+
+    class BlogItException(Exception):
+        pass
+
+
+    class NoPostException(BlogItException):
+        pass
+
+
+    class BlogItBug(BlogItException):
+        pass
+
+
+    class PostListingEmptyException(BlogItException):
+        pass
+
+
+    class ServerUnavailableException(BlogItException):
+        pass
+
+
+    class RequestCancelledException(BlogItException):
+        pass
+
+
+    class FilterException(BlogItException):
+
+        def __init__(self, message, input_text, filter):
+            self.message = "Blogit: Error happend while filtering with:" + \
+                    filter + '\n' + message
+            self.input_text = input_text
+            self.filter = filter
+
+
+    class VimVars(object):
+
+        def __init__(self, blog_name=None):
+            if blog_name is None:
+                blog_name = self.vim_blog_name
+            self.blog_name = blog_name
+
+        @property
+        def blog_clienttype(self):
+            client_type = self.vim_variable('clienttype')
+            if client_type is None:
+                client_type = "wordpress"
+            return client_type
+
+        @property
+        def blog_username(self):
+            return self.vim_variable('username')
+
+        @property
+        def blog_password(self):
+            return self.vim_variable('password')
+
+        @property
+        def blog_url(self):
+            """
+            >>> mock('vim.eval',
+            ...      returns_iter=[ '0', '0', '1', 'http://example.com/' ])
+            >>> BlogIt.VimVars().blog_url
+            Called vim.eval("exists('b:blog_name')")
+            Called vim.eval("exists('blog_name')")
+            Called vim.eval("exists('blogit_url')")
+            Called vim.eval('blogit_url')
+            'http://example.com/'
+            >>> minimock.restore()
+            """
+            return self.vim_variable('url')
+
+        @property
+        def blog_postsource(self):
+            """ Bool: Include unformated version of a post in an html comment.
+
+            If the program only converts to html, you can have blogit save the
+            "source" in an html comment (Warning: This doesn't work reliably
+            with Wordpress. Use at your own risk).
+
+                let blogit_postsource=1
+            """
+            return self.vim_variable('postsource') == '1'
+
+        @property
+        def blog_upload_jobs(self):
+            """ Int: Number of images uploaded in parallel (default: 4).
+
+                let blogit_upload_jobs=8
+            """
+            jobs = self.vim_variable('upload_jobs')
+            if jobs is None:
+                return 4
+            return max(1, int(jobs))
+
+        @property
+        def blog_media_index(self):
+            """ Path of the file remembering which images were uploaded.
+
+                let blogit_media_index="~/.vim/blogit-media.json"
+            """
+            path = self.vim_variable('media_index')
+            if path is None:
+                path = os.path.join('~', '.blogit',
+                                    'media-%s.json' % self.blog_name)
+            return os.path.expanduser(path)
+
+        @property
+        def blog_compress(self):
+            """ Int: Compress the XML-RPC traffic (default: 1).
+
+            0 turns compression off, 1 asks the server for gzip or deflate
+            compressed responses. Larger values also gzip requests bigger than
+            that many bytes (the server must accept compressed requests).
+
+                let blogit_compress=65536
+            """
+            compress = self.vim_variable('compress')
+            if compress is None:
+                return 1
+            return int(compress)
+
+        @property
+        def blog_timeout(self):
+            """ Seconds to wait for a connection and for each answer.
+
+            One number is used for both (default: 10 seconds to connect, 60 to
+            answer).
+
+                let blogit_timeout="5,120"
+            """
+            timeout = self.vim_variable('timeout')
+            if timeout is None:
+                return (10.0, 60.0)
+            timeout = [float(t) for t in timeout.split(',')]
+            return (timeout[0], timeout[-1])
+
+        @property
+        def blog_retries(self):
+            """ Int: Retries of reading calls failing on a network error or a
+            busy server (default: 3). Writing calls are never repeated.
+
+                let blogit_retries=0
+            """
+            retries = self.vim_variable('retries')
+            if retries is None:
+                return 3
+            return max(0, int(retries))
+
+        @property
+        def blog_prefetch(self):
+            """ Int: Posts above and below the cursor in the listing fetched in
+            the background (default: 2, 0 turns prefetching off).
+
+                let blogit_prefetch=5
+            """
+            rows = self.vim_variable('prefetch')
+            if rows is None:
+                return 2
+            return max(0, int(rows))
+
+        @property
+        def blog_lazy_comments(self):
+            """ Int: Show the threads of posts with more comments than this
+            folded away, each loaded into the buffer when its fold is opened
+            (default: 200).
+
+                let blogit_lazy_comments=0
+            """
+            comments = self.vim_variable('lazy_comments')
+            if comments is None:
+                return 200
+            return int(comments)
+
+        @property
+        def vim_blog_name(self):
+            for var_name in ('b:blog_name', 'blog_name'):
+                var_value = self.vim_variable(var_name, prefix=False)
+                if var_value is not None:
+                    return var_value
+            return 'blogit'
+
+        def vim_variable(self, var_name, prefix=True):
+            """ Simplify access to vim-variables. """
+            if prefix:
+                var_name = '_'.join((self.blog_name, var_name))
+            if vim.eval("exists('%s')" % var_name) == '1':
+                return vim.eval('%s' % var_name)
+            else:
+                return None
+
+        def export_blog_name(self):
+            vim.command("let b:blog_name='%s'" % self.blog_name)
+
+        def export_post_type(self, post):
+            vim.command("let b:blog_post_type='%s'" % post.POST_TYPE)
+
+
+    class CompressedTransport(xmlrpclib.SafeTransport):
+        """ XML-RPC transport negotiating compressed responses.
+
+        Responses are decompressed while they are read and fed to the parser
+        chunk by chunk. The bytes on the wire and their uncompressed size are
+        summed up in stats (see :Blogit traffic).
+
+        >>> t = BlogIt.CompressedTransport()
+        >>> body = xmlrpclib.dumps(('x' * 1000,), methodresponse=True)
+        >>> response = Mock('response', tracker=None)
+        >>> response.getheader.mock_returns = 'gzip'
+        >>> response.read.mock_returns_iter = [xmlrpclib.gzip_encode(body), '']
+        >>> t.parse_response(response) == ('x' * 1000,)
+        True
+        >>> response.getheader.mock_returns = 'deflate'
+        >>> response.read.mock_returns_iter = [zlib.compress(body)[2:-4], '']
+        >>> t.parse_response(response) == ('x' * 1000,)
+        True
+        """
+        CHUNK_SIZE = 16384
+        stats = {'sent': 0, 'sent_raw': 0, 'received': 0, 'received_raw': 0}
+        _stats_lock = threading.Lock()
+
+        def __init__(self, secure=False, compress=1, fields=None,
+                     timeout=(None, None)):
+            xmlrpclib.SafeTransport.__init__(self)
+            self.secure = secure
+            self.fields = fields
+            self.connect_timeout, self.read_timeout = timeout
+            self.accept_gzip_encoding = compress > 0
+            if compress > 1:
+                self.encode_threshold = compress
+
+        @classmethod
+        def server_proxy(cls, url, compress=1, fields=None,
+                         timeout=(None, None), retries=0):
+            """
+            >>> proxy = BlogIt.CompressedTransport.server_proxy(
+            ...         'https://example.com')
+            >>> proxy._ServerProxy__transport.secure
+            True
+            >>> BlogIt.CompressedTransport.server_proxy('http://example.com')
+            <ServerProxy for example.com/RPC2>
+            """
+            transport = cls(url.lower().startswith('https:'), compress, fields,
+                            timeout)
+            return BlogIt.ResilientServerProxy(url, transport=transport,
+                                               retries=retries)
+
+        @classmethod
+        def count(cls, **bytes):
+            cls._stats_lock.acquire()
+            try:
+                for key, n in bytes.iteritems():
+                    cls.stats[key] += n
+            finally:
+                cls._stats_lock.release()
+
+        def getparser(self):
+            if self.fields is None:
+                return xmlrpclib.SafeTransport.getparser(self)
+            target = BlogIt.ProjectingUnmarshaller(self.fields)
+            return xmlrpclib.ExpatParser(target), target
+
+        def make_connection(self, host):
+            if self.secure:
+                connection = xmlrpclib.SafeTransport.make_connection(self, host)
+            else:
+                connection = xmlrpclib.Transport.make_connection(self, host)
+            if self.connect_timeout is not None:
+                connection.timeout = self.connect_timeout
+            return connection
+
+        def send_request(self, connection, handler, request_body):
+            if self.accept_gzip_encoding:
+                connection.putrequest('POST', handler,
+                                      skip_accept_encoding=True)
+                connection.putheader('Accept-Encoding', 'gzip, deflate')
+            else:
+                connection.putrequest('POST', handler)
+
+        def send_content(self, connection, request_body):
+            connection.putheader('Content-Type', 'text/xml')
+            raw_size = len(request_body)
+            if isinstance(request_body, BlogIt.StreamedRequest):
+                # Media is compressed already: no gzip, send as it's encoded.
+                self.count(sent=raw_size, sent_raw=raw_size)
+                connection.putheader('Content-Length', str(raw_size))
+                connection.endheaders()
+                for chunk in request_body.chunks():
+                    connection.send(chunk)
+                if self.read_timeout is not None:
+                    connection.sock.settimeout(self.read_timeout)
+                return
+            if (self.encode_threshold is not None and
+                    self.encode_threshold < raw_size):
+                connection.putheader('Content-Encoding', 'gzip')
+                request_body = xmlrpclib.gzip_encode(request_body)
+            self.count(sent=len(request_body), sent_raw=raw_size)
+            connection.putheader('Content-Length', str(len(request_body)))
+            connection.endheaders(request_body)
+            if self.read_timeout is not None:
+                # Connected by now: switch to the timeout for the answer.
+                connection.sock.settimeout(self.read_timeout)
+
+        def parse_response(self, response):
+            encoding = response.getheader('Content-Encoding', '').lower()
+            if encoding in ('gzip', 'x-gzip', 'deflate'):
+                # Detects gzip and zlib headers.
+                decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+            else:
+                decompressor = None
+            p, u = self.getparser()
+            first_chunk = True
+            while True:
+                data = response.read(self.CHUNK_SIZE)
+                if not data:
+                    break
+                wire_size = len(data)
+                if decompressor is not None:
+                    try:
+                        data = decompressor.decompress(data)
+                    except zlib.error:
+                        if not (first_chunk and encoding == 'deflate'):
+                            raise
+                        # Some servers send deflate without zlib header.
+                        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                        data = decompressor.decompress(data)
+                first_chunk = False
+                self.count(received=wire_size, received_raw=len(data))
+                p.feed(data)
+            if decompressor is not None:
+                p.feed(decompressor.flush())
+            p.close()
+            return u.close()
+
+
+    class ProjectingUnmarshaller(xmlrpclib.Unmarshaller):
+        """ Unmarshaller keeping nothing but <fields> of each struct.
+
+        The text of other members is dropped while it is parsed, so large
+        values (e.g. post bodies) never pile up in memory.
+
+        >>> u = BlogIt.ProjectingUnmarshaller(['postid', 'title'])
+        >>> p = xmlrpclib.ExpatParser(u)
+        >>> p.feed(xmlrpclib.dumps(([{'postid': '1', 'title': 'T',
+        ...         'description': 'long text', 'categories': ['a', 'b'],
+        ...         'custom_fields': [{'key': 'k', 'value': 3}]}],),
+        ...     methodresponse=True)); p.close()
+        >>> u.close()
+        ([{'postid': '1', 'title': 'T'}],)
+        >>> u = BlogIt.ProjectingUnmarshaller(['postid'])
+        >>> p = xmlrpclib.ExpatParser(u)
+        >>> p.feed(xmlrpclib.dumps(Fault(403, 'Bad login'))); p.close()
+        >>> u.close()
+        Traceback (most recent call last):
+            ...
+        Fault: <Fault 403: 'Bad login'>
+        """
+        SCALARS = ('nil', 'boolean', 'i4', 'i8', 'int', 'double', 'string',
+                   'base64', 'dateTime.iso8601')
+
+        def __init__(self, fields, use_datetime=0):
+            xmlrpclib.Unmarshaller.__init__(self, use_datetime)
+            self.fields = frozenset(fields) | set(['faultCode', 'faultString'])
+            # Nesting depth of the member being dropped (None: keep all).
+            self._drop_depth = None
+
+        def _dropping(self):
+            return (self._drop_depth is not None and
+                    len(self._marks) >= self._drop_depth)
+
+        def data(self, text):
+            if not self._dropping():
+                xmlrpclib.Unmarshaller.data(self, text)
+
+        def end(self, tag):
+            if self._dropping():
+                if tag == 'member' and len(self._marks) == self._drop_depth:
+                    self._drop_depth = None
+                elif tag in self.SCALARS:
+                    self.append(None)
+                    self._value = 0
+                    return
+            elif tag == 'name' and ''.join(self._data) not in self.fields:
+                self._drop_depth = len(self._marks)
+            return xmlrpclib.Unmarshaller.end(self, tag)
+
+        def end_struct(self, data):
+            xmlrpclib.Unmarshaller.end_struct(self, data)
+            struct = self._stack[-1]
+            for key in struct.keys():
+                if key not in self.fields:
+                    del struct[key]
+        dispatch = xmlrpclib.Unmarshaller.dispatch.copy()
+        dispatch['struct'] = end_struct
+
+
+    class CallPolicy(object):
+        """ Retries and circuit breaker for the calls to one host.
+
+        Calls failing on a network error, a timeout or a busy server (see
+        is_transient) are repeated after a jittered exponential backoff if they
+        are idempotent. After BREAKER_FAILURES such failures in a row the
+        breaker of the host opens: calls fail at once for BREAKER_COOLDOWN
+        seconds, then a single call may try again. Ctrl-C cancels the call.
+
+        >>> policy = BlogIt.CallPolicy('doctest.invalid', retries=2,
+        ...                            backoff=0)
+        >>> answers = [socket.timeout('timed out'), socket.timeout('timed out'),
+        ...            'answer']
+        >>> def flaky():
+        ...     answer = answers.pop(0)
+        ...     if isinstance(answer, Exception):
+        ...         raise answer
+        ...     return answer
+        >>> policy.call(flaky, idempotent=True)
+        'answer'
+        >>> answers = [socket.timeout('timed out'), 'answer']
+        >>> policy.call(flaky)
+        Traceback (most recent call last):
+            ...
+        timeout: timed out
+        >>> def interrupted():
+        ...     raise KeyboardInterrupt
+        >>> policy.call(interrupted, idempotent=True)
+        Traceback (most recent call last):
+            ...
+        RequestCancelledException: Request to doctest.invalid cancelled.
+        """
+        BREAKER_FAILURES = 5
+        BREAKER_COOLDOWN = 30
+        MAX_BACKOFF = 8
+        TRANSIENT_HTTP_ERRORS = (429, 500, 502, 503, 504)
+        # host: [failures in a row, time the breaker opened or None]
+        breakers = {}
+        _breakers_lock = threading.Lock()
+
+        def __init__(self, host, retries=0, backoff=0.5):
+            self.host = host
+            self.retries = retries
+            self.backoff = backoff
+
+        def call(self, func, idempotent=False):
+            """ Returns func(), following the policy. """
+            attempt = 0
+            while True:
+                self.check_breaker()
+                try:
+                    result = func()
+                except KeyboardInterrupt:
+                    raise BlogIt.RequestCancelledException(
+                            _('Request to %s cancelled.') % self.host)
+                except Exception, e:
+                    if self.is_cancelled(e):
+                        raise BlogIt.RequestCancelledException(
+                                _('Request to %s cancelled.') % self.host)
+                    if not self.is_transient(e):
+                        if isinstance(e, (Fault, xmlrpclib.ProtocolError,
+                                          urllib2.HTTPError)):
+                            self.record(True)    # The server did answer.
+                        raise
+                    self.record(False)
+                    if not idempotent or attempt >= self.retries:
+                        raise
+                    sleep(random.uniform(0, min(self.MAX_BACKOFF,
+                                                self.backoff * 2 ** attempt)))
+                    attempt += 1
+                else:
+                    self.record(True)
+                    return result
+
+        def check_breaker(self):
+            self._breakers_lock.acquire()
+            try:
+                failures, opened = self.breakers.get(self.host, (0, None))
+                if opened is None:
+                    return
+                if time() - opened < self.BREAKER_COOLDOWN:
+                    raise BlogIt.ServerUnavailableException(
+                            _('%s failed %d times in a row, not trying again '
+                              'for %d seconds.') % (self.host, failures,
+                                                    self.BREAKER_COOLDOWN))
+                # Half open: let this call through, the others wait.
+                self.breakers[self.host] = [failures, time()]
+            finally:
+                self._breakers_lock.release()
+
+        def record(self, success):
+            self._breakers_lock.acquire()
+            try:
+                if success:
+                    self.breakers.pop(self.host, None)
+                    return
+                failures, opened = self.breakers.get(self.host, (0, None))
+                failures += 1
+                if failures >= self.BREAKER_FAILURES:
+                    opened = time()
+                self.breakers[self.host] = [failures, opened]
+            finally:
+                self._breakers_lock.release()
+
+        @staticmethod
+        def is_cancelled(e):
+            """ Ctrl-C interrupts a blocking socket call with EINTR. """
+            e = getattr(e, 'reason', e)
+            return (isinstance(e, EnvironmentError) and
+                    e.errno == errno.EINTR)
+
+        @classmethod
+        def is_transient(cls, e):
+            """
+            >>> BlogIt.CallPolicy.is_transient(socket.error(111, 'refused'))
+            True
+            >>> BlogIt.CallPolicy.is_transient(xmlrpclib.ProtocolError(
+            ...         'example.com/RPC2', 503, 'Unavailable', {}))
+            True
+            >>> BlogIt.CallPolicy.is_transient(xmlrpclib.ProtocolError(
+            ...         'example.com/RPC2', 403, 'Forbidden', {}))
+            False
+            >>> BlogIt.CallPolicy.is_transient(Fault(4, 'Bad login'))
+            False
+            """
+            if isinstance(e, xmlrpclib.ProtocolError):
+                return e.errcode in cls.TRANSIENT_HTTP_ERRORS
+            if isinstance(e, urllib2.HTTPError):
+                return e.code in cls.TRANSIENT_HTTP_ERRORS
+            if isinstance(e, urllib2.URLError):
+                return True
+            return isinstance(e, (socket.error, httplib.HTTPException))
+
+
+    class ResilientServerProxy(xmlrpclib.ServerProxy):
+        """ ServerProxy making its calls through a CallPolicy.
+
+        >>> proxy = BlogIt.ResilientServerProxy('http://example.com/RPC2')
+        >>> proxy.idempotent('metaWeblog.getPost', (42, 'user', 'password'))
+        True
+        >>> proxy.idempotent('metaWeblog.editPost', (42, 'user', 'password'))
+        False
+        >>> proxy.idempotent('system.multicall', ([
+        ...         {'methodName': 'metaWeblog.getPost', 'params': []},
+        ...         {'methodName': 'wp.getCommentCount', 'params': []}],))
+        True
+        """
+        READING_CALLS = frozenset(['metaWeblog.getPost',
+                                   'metaWeblog.getRecentPosts',
+                                   'metaWeblog.getCategories', 'wp.getPage',
+                                   'wp.getPageList', 'wp.getPosts',
+                                   'wp.getComments', 'wp.getCommentCount',
+                                   'wp.getCategories', 'wp.getTags',
+                                   'system.listMethods'])
+
+        def __init__(self, uri, transport=None, retries=0):
+            xmlrpclib.ServerProxy.__init__(self, uri, transport)
+            self._policy = BlogIt.CallPolicy(self._ServerProxy__host, retries)
+
+        def idempotent(self, methodname, params):
+            if methodname == 'system.multicall':
+                return all(self.idempotent(call['methodName'], call['params'])
+                           for call in params[0])
+            return methodname in self.READING_CALLS
+
+        def _ServerProxy__request(self, methodname, params):
+            if BlogIt.StreamedRequest.wanted(params):
+                request = partial(self._stream_request, methodname, params)
+            else:
+                request = partial(xmlrpclib.ServerProxy._ServerProxy__request,
+                                  self, methodname, params)
+            try:
+                return self._policy.call(request,
+                                         self.idempotent(methodname, params))
+            except BlogIt.RequestCancelledException:
+                # Don't reuse a connection with an answer half read.
+                self._ServerProxy__transport.close()
+                raise
+
+        def _stream_request(self, methodname, params):
+            response = self._ServerProxy__transport.request(
+                    self._ServerProxy__host, self._ServerProxy__handler,
+                    BlogIt.StreamedRequest(methodname, params),
+                    verbose=self._ServerProxy__verbose)
+            if len(response) == 1:
+                response = response[0]
+            return response
+
+
+    @staticmethod
+    def server_proxy(vim_vars, fields=None):
+        """ Returns a ServerProxy for the blog configured in vim_vars.
+
+        With fields, structs in responses are stripped to these keys.
+        """
+        return BlogIt.CompressedTransport.server_proxy(vim_vars.blog_url,
+                                                       vim_vars.blog_compress,
+                                                       fields,
+                                                       vim_vars.blog_timeout,
+                                                       vim_vars.blog_retries)
+
+
+    class AbstractBlogClient(object):
+        """Abstracts client specific behavior. Currently three types of clients are supported:
+            - MetaWeblog (Implementation: xmlrpc.metaWeblog). See MetaWebblogBlogClient.
+            - Wordpress (Implementation: xmlrpc.metaWeblog + xmlrpc.wp). See WordPressBlogClient.
+            - Tumblr (Implementation: tumblr REST api). See TumblrBlogClient.
+        """
+
+        def __new__(cls, vim_vars=None):
+            import pdb
+            """Factory pattern to choose the appropriate blog client implementation based on
+            variables.
+            """
+            if (vim_vars == None):
+                vim_vars = BlogIt.VimVars()
+            cls.vim_vars = vim_vars
+            cls.client_instance = None
+            blog_type = BlogIt.MetaWeblogBlogClient
+            if cls.vim_vars.blog_clienttype == "wordpress":
+                blog_type = BlogIt.WordPressBlogClient
+            if cls.vim_vars.blog_clienttype == "tumblr":
+                blog_type = BlogIt.TumblrBlogClient
+            return object.__new__(blog_type)
+
+        def create_new_post(self, post_content=[''], post_type=None):
+            """Creates a new blog post. Must be implemented by derived clients."""
+            raise NotImplementedError("create_new_post is not implemented in %s" % str(self))
+
+        def get_date_format(self):
+            """Returns the date format for Posts, Pages etc. Default format is suitable for
+            Metaweblog and Wordpress.
+            """
+            return '%Y%m%dT%H:%M:%S'
+
+        def get_post_groups(self):
+            """Returns the post types supported by this blog client."""
+            return [group(self.vim_vars) for group in self._get_post_group_types()]
+
+        def get_posts(self, post_type, fields=None):
+            """Gets the posts of type <post_type> from the blog. Must be implemented by derived
+            clients. If <fields> is given, the posts may be stripped to these keys.
+            """
+            raise NotImplementedError("get_posts is not implemented in %s" % str(self))
+
+        def _get_post_group_types(self):
+            """Gets a tuple of types of posts supported by the blog. Must be implemented by derived
+            clients.
+            """
+            raise NotImplementedError("_get_post_group_types is not implemented in %s" % str(self))
+
+        def _http_post_response(self, url, params, idempotent=False):
+            data = urllib.urlencode(params)
+            req = urllib2.Request(url, data)
+            # urllib2 knows a single timeout, for the connection and answer.
+            timeout = max(self.vim_vars.blog_timeout)
+            policy = BlogIt.CallPolicy(req.get_host(),
+                                       self.vim_vars.blog_retries)
+
+            def post():
+                return urllib2.urlopen(req, timeout=timeout).read()
+            try:
+                return policy.call(post, idempotent)
+            except urllib2.HTTPError, e:
+                print e.read()
+                raise e
+
+
+    class MetaWeblogBlogClient(AbstractBlogClient):
+        def get_posts(self, post_type, fields=None):
+            """Possible post types:
+                - MetaWeblog: Text (aka normal blog post)
+            """
+            data = None
+            if post_type == "text":
+                data = self._get_recent_posts(fields)
+            return data
+
+        def _get_recent_posts(self, fields=None):
+            """metaWeblog.getRecentPosts can't be told to leave out the post
+            bodies, so with <fields> they are dropped while parsing.
+            """
+            if fields is None:
+                client = self._get_client_instance()
+            else:
+                client = BlogIt.server_proxy(self.vim_vars, fields)
+            return client.metaWeblog.getRecentPosts('',
+                                                    self.vim_vars.blog_username,
+                                                    self.vim_vars.blog_password)
+
+        def _get_client_instance(self):
+            if self.client_instance is None:
+                self.client_instance = BlogIt.server_proxy(self.vim_vars)
+            return self.client_instance
+
+        def _get_post_group_types(self):
+            return [BlogIt.MetaWeblogPostListingPosts]
+
+
+    class WordPressBlogClient(MetaWeblogBlogClient):
+        def create_new_post(self, post_content=[''], post_type=None):
+            return BlogIt.WordPressBlogPost.create_new_post(self.vim_vars, post_content)
+
+        # metaWeblog names of the fields in wp.getPosts (WordPress 3.4+).
+        WP_POST_FIELDS = {'postid': 'post_id', 'title': 'post_title',
+                          'date_created_gmt': 'post_date_gmt'}
+        METHOD_NOT_FOUND = -32601
+        # Urls of the blogs known to lack wp.getPosts.
+        without_wp_get_posts = set()
+
+        def get_posts(self, post_type, fields=None):
+            """Possible post types:
+                - MetaWeblog: Text (aka normal blog post)
+                - Wordpress: [MetaWeblog], Page
+            """
+            data = None
+            if post_type == "text":
+                url = self.vim_vars.blog_url
+                if (fields is None or not self._projectable(fields) or
+                        url in self.without_wp_get_posts):
+                    data = self._get_recent_posts(fields)
+                else:
+                    try:
+                        data = self._wp_get_posts(fields)
+                    except Fault, e:
+                        # wp.getPosts is missing before WordPress 3.4.
+                        if e.faultCode != self.METHOD_NOT_FOUND:
+                            raise
+                        self.without_wp_get_posts.add(url)
+                        data = self._get_recent_posts(fields)
+            elif post_type == "page":
+                data = self._get_client_instance().wp.getPageList('',
+                                                                  self.vim_vars.blog_username,
+                                                                  self.vim_vars.blog_password)
+            return data
+
+        def _projectable(self, fields):
+            return all(f in self.WP_POST_FIELDS for f in fields)
+
+        def _wp_get_posts(self, fields):
+            """ Asks the server for nothing but <fields> of the posts.
+
+            >>> mock('vim.mocked_eval', tracker=None)
+            >>> c = BlogIt.AbstractBlogClient(BlogIt.VimVars())
+            >>> c.client_instance = Mock('client')
+            >>> c.client_instance.wp.getPosts.mock_returns = [
+            ...         {'post_id': '7', 'post_title': 'A title'}]
+            >>> c._wp_get_posts(('postid', 'title'))
+            ...     #doctest: +NORMALIZE_WHITESPACE
+            Called client.wp.getPosts(
+                '',
+                'user',
+                'password',
+                {'post_type': 'post'},
+                ['post_id', 'post_title'])
+            [{'postid': '7', 'title': 'A title'}]
+            >>> minimock.restore()
+            """
+            posts = self._get_client_instance().wp.getPosts('',
+                    self.vim_vars.blog_username, self.vim_vars.blog_password,
+                    {'post_type': 'post'},
+                    [self.WP_POST_FIELDS[f] for f in fields])
+            return [dict((f, p[self.WP_POST_FIELDS[f]]) for f in fields)
+                    for p in posts]
+
+        def _get_post_group_types(self):
+            return [BlogIt.MetaWeblogPostListingPosts, BlogIt.WordPressPostListingPages]
+
+
+    class TumblrBlogClient(AbstractBlogClient):
+        def create_new_post(self, post_content=[''], post_type=None):
+            return BlogIt.TumblrBlogPost.create_new_post(self.vim_vars, post_content)
+
+        def get_date_format(self):
+            return '%Y-%m-%d %H:%M:%S %Z'
+
+        def get_posts(self, post_type, fields=None):
+            """Possible post types: Text
+            Supported post types in Tumblr: Text, Photo, Quote, Link, Chat, Audio, Video.
+            """
+            data = None
+            if post_type == "text":
+                params = {}
+                params["type"] = "text"
+                data = self._tumblr_http_post(self.vim_vars.blog_url + "/api/read/json", params)
+            return data
+
+        def _get_post_group_types(self):
+            return [BlogIt.TumblrPostListingPosts]
+
+        def _tumblr_http_post(self, url, params = {}):
+            params["email"] = self.vim_vars.blog_username
+            params["password"] = self.vim_vars.blog_password
+            params["generator"] = "vim-blogit"
+
+            # Only used for /api/read: safe to repeat.
+            server_response = self._http_post_response(url, params, True)
+            m = re.match("^.*?({.*}).*$", server_response, re.DOTALL | re.MULTILINE)
+            post_data = json.loads(m.group(1))["posts"]
+            return post_data
+
+
+    class MediaFile(object):
+        """ A local file sent as XML-RPC base64 without reading it at once.
+
+        The file is encoded chunk by chunk while the request is sent (see
+        StreamedRequest), so neither the raw file nor its encoding is held in
+        memory (unlike xmlrpclib.Binary).
+
+        >>> f = tempfile.NamedTemporaryFile()
+        >>> f.write('GIF89a'); f.flush()
+        >>> xml = xmlrpclib.dumps((BlogIt.MediaFile(f.name),))
+        >>> xml[xml.index('<value>'):xml.index('</value>') + 8]
+        '<value><base64>\\nR0lGODlh\\n</base64></value>'
+        >>> xmlrpclib.loads(xml)[0][0].data
+        'GIF89a'
+        """
+        CHUNK_SIZE = 57 * 1024    # base64 lines hold 57 bytes.
+
+        def __init__(self, path):
+            self.path = path
+
+        def chunks(self):
+            f = open(self.path, 'rb')
+            try:
+                while True:
+                    chunk = f.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                f.close()
+
+        @property
+        def sha1(self):
+            h = hashlib.sha1()
+            for chunk in self.chunks():
+                h.update(chunk)
+            return h.hexdigest()
+
+        @property
+        def mime_type(self):
+            return (mimetypes.guess_type(self.path)[0] or
+                    'application/octet-stream')
+
+        HEAD = '<value><base64>\n'
+        TAIL = '</base64></value>\n'
+
+        def encoded_chunks(self):
+            yield self.HEAD
+            for chunk in self.chunks():
+                yield base64.encodestring(chunk)
+            yield self.TAIL
+
+        def encoded_size(self):
+            """ Bytes of the encoding, without encoding the file.
+
+            >>> f = tempfile.NamedTemporaryFile()
+            >>> f.write('x' * 200000); f.flush()
+            >>> media = BlogIt.MediaFile(f.name)
+            >>> media.encoded_size() == len(''.join(media.encoded_chunks()))
+            True
+            """
+            size = os.path.getsize(self.path)
+            # CHUNK_SIZE is a multiple of 3 and 57: it's as if encoded at once.
+            return (len(self.HEAD) + 4 * ((size + 2) // 3) + (size + 56) // 57
+                    + len(self.TAIL))
+
+        def encode(self, write):
+            for chunk in self.encoded_chunks():
+                write(chunk)
+
+
+    class StreamedRequest(object):
+        """ The body of an XML-RPC call with MediaFiles, encoded as it's sent.
+
+        >>> f = tempfile.NamedTemporaryFile()
+        >>> f.write('GIF89a' * 100000); f.flush()
+        >>> params = ('', 'user', {'bits': BlogIt.MediaFile(f.name)})
+        >>> request = BlogIt.StreamedRequest('upload', params)
+        >>> body = ''.join(request.chunks())
+        >>> body == xmlrpclib.dumps(params, 'upload')
+        True
+        >>> len(request) == len(body)
+        True
+        """
+
+        def __init__(self, methodname, params):
+            self.pieces = []    # Strings and MediaFiles
+            text = []
+
+            def write(piece):
+                if isinstance(piece, BlogIt.MediaFile):
+                    self.pieces.extend([''.join(text), piece])
+                    del text[:]
+                else:
+                    text.append(piece)
+            write("<?xml version='1.0'?>\n<methodCall>\n<methodName>%s"
+                  "</methodName>\n" % methodname)
+            BlogIt.StreamingMarshaller('utf-8').dumps(params, write)
+            write('</methodCall>\n')
+            self.pieces.append(''.join(text))
+
+        @staticmethod
+        def wanted(value):
+            """ Returns if there is a MediaFile in value. """
+            if isinstance(value, BlogIt.MediaFile):
+                return True
+            if isinstance(value, dict):
+                value = value.values()
+            if isinstance(value, (list, tuple)):
+                return any(BlogIt.StreamedRequest.wanted(v) for v in value)
+            return False
+
+        def __len__(self):
+            return sum(isinstance(piece, BlogIt.MediaFile) and
+                       piece.encoded_size() or len(piece)
+                       for piece in self.pieces)
+
+        def chunks(self):
+            for piece in self.pieces:
+                if isinstance(piece, BlogIt.MediaFile):
+                    for chunk in piece.encoded_chunks():
+                        yield chunk
+                else:
+                    yield piece
+
+
+    class StreamingMarshaller(xmlrpclib.Marshaller):
+        """ Marshaller passing MediaFiles to write() as they are. """
+        dispatch = xmlrpclib.Marshaller.dispatch.copy()
+
+        def dumps(self, values, write):
+            """ Writes the <params> of values. """
+            write('<params>\n')
+            for v in values:
+                write('<param>\n')
+                self._Marshaller__dump(v, write)
+                write('</param>\n')
+            write('</params>\n')
+
+
+    class MediaIndex(object):
+        """ Remembers the url of each uploaded file by its content hash.
+
+        One index can be shared by the threads of several uploaders: a file
+        is only sent by one of them, the others wait for its url.
+
+        >>> index = BlogIt.MediaIndex('/nonexistent/media.json')
+        >>> index.get('da39a3ee') is None
+        True
+        >>> index['da39a3ee'] = 'http://example.com/a.png'
+        >>> index.get('da39a3ee')
+        'http://example.com/a.png'
+        >>> index.upload('da39a3ee', lambda: 'http://example.com/b.png')
+        'http://example.com/a.png'
+        >>> BlogIt.MediaIndex('/etc/passwd').urls    # Not json: start over.
+        {}
+        """
+
+        def __init__(self, path):
+            self.path = path
+            self.urls = {}
+            self._sending = set()    # Hashes of the files being uploaded.
+            self._sent = threading.Condition(threading.Lock())
+            try:
+                f = open(path)
+            except IOError:
+                return
+            try:
+                self.urls = json.load(f)
+            except ValueError:
+                pass
+            finally:
+                f.close()
+
+        def get(self, sha1):
+            return self.urls.get(sha1)
+
+        def __setitem__(self, sha1, url):
+            self._sent.acquire()
+            try:
+                self.urls[sha1] = url
+            finally:
+                self._sent.release()
+
+        def upload(self, sha1, send):
+            """ Returns the url of the file with hash sha1.
+
+            Calls send() to upload the file unless it's already uploaded or
+            another thread is uploading it.
+            """
+            self._sent.acquire()
+            try:
+                while sha1 in self._sending:
+                    self._sent.wait()
+                if sha1 in self.urls:
+                    return self.urls[sha1]
+                self._sending.add(sha1)
+            finally:
+                self._sent.release()
+            url = None
+            try:
+                url = send()
+                return url
+            finally:
+                self._sent.acquire()
+                try:
+                    self._sending.discard(sha1)
+                    if url is not None:
+                        self.urls[sha1] = url
+                    self._sent.notify_all()
+                finally:
+                    self._sent.release()
+
+        def save(self):
+            self._sent.acquire()
+            try:
+                self._save()
+            finally:
+                self._sent.release()
+
+        def _save(self):
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            # Replace the index at once: a crash never leaves half of it.
+            fd, tmp = tempfile.mkstemp(dir=directory or '.',
+                                       prefix='.media-')
+            try:
+                f = os.fdopen(fd, 'w')
+                try:
+                    json.dump(self.urls, f, indent=0, sort_keys=True)
+                finally:
+                    f.close()
+                os.rename(tmp, self.path)
+            except:
+                os.remove(tmp)
+                raise
+
+
+    class MediaUploader(object):
+        """ Uploads local images of a post via metaWeblog.newMediaObject. """
+        IMAGE_PATTERNS = (re.compile(r'(!\[[^\]]*\]\()([^)\s]+)'),
+                          re.compile(r'''(<img\b[^>]*?\bsrc=["'])([^"']+)''',
+                                     re.IGNORECASE))
+
+        def __init__(self, vim_vars, base_dir='.', index=None):
+            # Read everything from vim here: the workers run in threads.
+            self.blog_url = vim_vars.blog_url
+            self.username = vim_vars.blog_username
+            self.password = vim_vars.blog_password
+            self.compress = vim_vars.blog_compress
+            self.timeout = vim_vars.blog_timeout
+            self.jobs = vim_vars.blog_upload_jobs
+            if index is None:
+                index = BlogIt.MediaIndex(vim_vars.blog_media_index)
+            self.index = index
+            self.base_dir = base_dir
+
+        @staticmethod
+        def local_path(ref, base_dir):
+            """ Returns the file ref points to or None if it isn't local.
+
+            >>> BlogIt.MediaUploader.local_path('http://x/a.png', '/') is None
+            True
+            >>> BlogIt.MediaUploader.local_path('etc/passwd', '/')
+            '/etc/passwd'
+            >>> BlogIt.MediaUploader.local_path('no/such/a.png', '/') is None
+            True
+            """
+            if re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:', ref):
+                return None
+            path = os.path.join(base_dir, os.path.expanduser(ref))
+            if os.path.isfile(path):
+                return os.path.normpath(path)
+            return None
+
+        @classmethod
+        def find_local_media(cls, lines, base_dir):
+            """ Returns the references in lines that point to local files.
+
+            >>> BlogIt.MediaUploader.find_local_media(
+            ...         ['![a](etc/passwd) ![b](http://x/b.png)',
+            ...          '<IMG alt="c" src="/etc/passwd">', '![d](nofile)'],
+            ...         '/')
+            ['etc/passwd', '/etc/passwd']
+            """
+            refs = []
+            for line in lines:
+                for pattern in cls.IMAGE_PATTERNS:
+                    for m in pattern.finditer(line):
+                        ref = m.group(2)
+                        if ref not in refs and cls.local_path(ref, base_dir):
+                            refs.append(ref)
+            return refs
+
+        def rewrite(self, lines, urls):
+            """ Replaces references in lines by the urls they map to.
+
+            >>> mock('vim.mocked_eval', tracker=None)
+            >>> u = BlogIt.MediaUploader(BlogIt.VimVars(), '/')
+            >>> u.rewrite(['![a](a.png "t")', '<img src="a.png">', 'a.png'],
+            ...           {'a.png': 'http://x/a.png'})
+            ['![a](http://x/a.png "t")', '<img src="http://x/a.png">', 'a.png']
+            >>> minimock.restore()
+            """
+
+            def replace(m):
+                return m.group(1) + urls.get(m.group(2), m.group(2))
+            for pattern in self.IMAGE_PATTERNS:
+                lines = [pattern.sub(replace, line) for line in lines]
+            return lines
+
+        def upload_file(self, media):
+            client = BlogIt.CompressedTransport.server_proxy(self.blog_url,
+                                                             self.compress,
+                                                             None,
+                                                             self.timeout)
+            data = {'name': os.path.basename(media.path),
+                    'type': media.mime_type, 'bits': media}
+            return client.metaWeblog.newMediaObject('', self.username,
+                                                    self.password, data)['url']
+
+        def upload(self, lines):
+            """ Uploads the local images in lines and returns the new lines.
+
+            Files with a content hash already in the index aren't sent again.
+            """
+            urls, pending = {}, {}
+            for ref in self.find_local_media(lines, self.base_dir):
+                media = BlogIt.MediaFile(self.local_path(ref, self.base_dir))
+                sha1 = media.sha1
+                if self.index.get(sha1) is not None:
+                    urls[ref] = self.index.get(sha1)
+                else:
+                    pending.setdefault(sha1, (media, []))[1].append(ref)
+            if pending:
+
+                def upload_pending((sha1, (media, refs))):
+                    url = self.index.upload(sha1,
+                                            lambda: self.upload_file(media))
+                    for ref in refs:
+                        urls[ref] = url
+                try:
+                    BlogIt.parallel_map(upload_pending, pending.items(),
+                                        self.jobs)
+                finally:
+                    self.index.save()
+            return self.rewrite(lines, urls)
+
+
+    class NoPost(object):
+        BLOG_POST_ID = ''
+
+        @property
+        def client(self):
+            return BlogIt.AbstractBlogClient(self.vim_vars)
+
+        @property
+        def vim_vars(self):
+            return BlogIt.VimVars()
+
+        def __getattr__(self, name):
+            raise BlogIt.NoPostException
+
+
+    class AbstractBufferIO(object):
+
+        def refresh_vim_buffer(self):
+            vim.current.buffer[:] = [BlogIt.enc(line)
+                                            for line in self.display()]
+            vim.command('setlocal nomodified')
+
+        def init_vim_buffer(self):
+            vim.command('setlocal encoding=utf-8')
+            self.refresh_vim_buffer()
+
+        def send(self, lines=[], push=None):
+            self.read_post(lines)
+            self.do_send(push)
+
+        def do_send(self, push=None):
+            raise BlogIt.NoPostException
+
+        def upload_media(self, lines, base_dir='.', index=None):
+            """ Returns lines with local images replaced by uploaded ones.
+
+            The urls of uploaded files are remembered in index (by default
+            the one in blogit_media_index).
+            """
+            return lines
+
+        def spill(self):
+            """ Returns the data fetched from the server and drops it.
+
+            Called while the buffer is hidden. The data is handed back to
+            unspill() before the post is used again.
+            """
+            state, self.post_data = self.spill_state(), None
+            return state
+
+        def spill_state(self):
+            """ Returns what spill() would, but keeps the data. """
+            return self.post_data
+
+        def unspill(self, state):
+            self.post_data = state
+
+
+    class PostListing(AbstractBufferIO):
+        POST_TYPE = 'list'
+
+        def __init__(self, vim_vars=None, client=None):
+            if vim_vars is None:
+                vim_vars = BlogIt.VimVars()
+            self.vim_vars = vim_vars
+            if client is None:
+                client = BlogIt.AbstractBlogClient(self.vim_vars)
+            self.client = client
+            self.post_data = None
+            self.row_groups = self.client.get_post_groups()
+
+        @classmethod
+        def create_new_post(cls, vim_vars, body_lines=['']):
+            b = cls(vim_vars=vim_vars)
+            b.getPost()
+            b.init_vim_buffer()
+            return b
+
+        def init_vim_buffer(self):
+            super(BlogIt.PostListing, self).init_vim_buffer()
+            vim.command('setlocal buftype=nofile bufhidden=wipe nobuflisted ' +
+                    'noswapfile syntax=blogsyntax nomodifiable nowrap')
+            vim.current.window.cursor = (2, 0)
+            vim.command('nnoremap <buffer> <enter> :Blogit! list_edit<cr>')
+            vim.command('nnoremap <buffer> gf :Blogit! list_edit<cr>')
+            vim.command('augroup blogit_list')
+            vim.command('autocmd! * <buffer>')
+            vim.command('autocmd CursorMoved <buffer> Blogit! list_prefetch')
+            vim.command('augroup END')
+
+        def display(self):
+            """ Yields the rows of a table displaying the posts (at least one).
+
+            >>> p = BlogIt.PostListing()
+            >>> p.display().next()       #doctest: +ELLIPSIS
+            Traceback (most recent call last):
+              [...]
+            PostListingEmptyException
+            >>> p.row_groups[0].post_data = [ {'postid': '1',
+            ...     'date_created_gmt': DateTime('20090628T17:38:58'),
+            ...     'title': 'A title'} ]
+            >>> list(p.display())    #doctest: +NORMALIZE_WHITESPACE
+            ['ID    Date        Title',
+            u' 1    06/28/09    A title']
+            >>> p.row_groups[0].post_data = [{'postid': id,
+            ...     'date_created_gmt': DateTime(d), 'title': t}
+            ...     for id, d, t in zip(( '7', '42' ),
+            ...         ( '20090628T17:38:58', '20100628T17:38:58' ),
+            ...         ( 'First Title', 'Second Title' )
+            ...     )]
+            >>> list(p.display())    #doctest: +NORMALIZE_WHITESPACE
+            ['ID    Date        Title',
+            u' 7    06/28/09    First Title',
+            u'42    06/28/10    Second Title']
+
+            """
+            for row_group in self.row_groups:
+                if not row_group.is_empty:
+                    break
+            else:
+                raise BlogIt.PostListingEmptyException
+            id_column_width = max(2, *[p.min_id_column_width
+                                            for p in self.row_groups])
+            yield "ID    %sDate%sTitle" % (' ' * (id_column_width - 2),
+                    ' ' * len(BlogIt.DateTime_to_str(DateTime(), '%x')))
+            format = '%%%dd    %%s    %%s' % id_column_width
+            for row_group in self.row_groups:
+                for post_id, date, title in row_group.rows_data():
+                    yield format % (int(post_id),
+                                    BlogIt.DateTime_to_str(date, '%x', self.client.get_date_format()),
+                                    title)
+
+        def getPost(self):
+            #FIXME is it possible to use multicalls with current refactoring?
+            for row_group in self.row_groups:
+                row_group.getPost(self.client)
+
+        def spill(self):
+            state = self.spill_state()
+            for row_group in self.row_groups:
+                row_group.post_data = []
+            return state
+
+        def spill_state(self):
+            return [row_group.post_data for row_group in self.row_groups]
+
+        def unspill(self, state):
+            for row_group, post_data in zip(self.row_groups, state):
+                row_group.post_data = post_data
+
+        def open_row(self, n):
+            n -= 2    # Table header & vim_buffer lines start at 1
+            for row_group in self.row_groups:
+                if n < len(row_group.post_data):
+                    return row_group.open_row(n)
+                else:
+                    n -= len(row_group.post_data)
+
+
+    class AbstractPostListingSource(object):
+
+        def __init__(self, id_date_title_tags, vim_vars):
+            self.id_date_title_tags = id_date_title_tags
+            self.vim_vars = vim_vars
+            self.post_data = []
+
+        def client_call__getPost(self, client):
+            """Must be implemented by inherited classes"""
+            raise NotImplementedError
+
+        def getPost(self, client):
+            self.post_data = self.client_call__getPost(client)
+
+        @property
+        def is_empty(self):
+            return len(self.post_data) == 0
+
+        @property
+        def min_id_column_width(self):
+            return max(-1, -1,    # Work-around max(-1, *[]) not-iterable.
+                       *[len(str(p[self.id_date_title_tags[0]]))
+                                                for p in self.post_data])
+
+        def rows_data(self):
+            post_id, date, title = self.id_date_title_tags
+            for p in self.post_data:
+                yield (p[post_id], p[date], p[title])
+
+
+    class MetaWeblogPostListingPosts(AbstractPostListingSource):
+
+        def __init__(self, vim_vars):
+            super(BlogIt.MetaWeblogPostListingPosts,
+                  self).__init__(('postid', 'date_created_gmt', 'title'),
+                                 vim_vars)
+
+        def client_call__getPost(self, client):
+            return client.get_posts("text", self.id_date_title_tags)
+
+        def open_row(self, n):
+            id = self.post_data[n]['postid']
+            return BlogIt.WordPressBlogPost(id, vim_vars=self.vim_vars)
+
+
+    class WordPressPostListingPages(AbstractPostListingSource):
+
+        def __init__(self, vim_vars):
+            super(BlogIt.WordPressPostListingPages,
+                  self).__init__(('page_id', 'dateCreated', 'page_title'),
+                                 vim_vars)
+
+        def client_call__getPost(self, client):
+            return client.get_posts("page", self.id_date_title_tags)
+
+        def open_row(self, n):
+            id = self.post_data[n]['page_id']
+            return BlogIt.WordPressPage(id, vim_vars=self.vim_vars)
+
+
+    class TumblrPostListingPosts(AbstractPostListingSource):
+
+        def __init__(self, vim_vars):
+            super(BlogIt.TumblrPostListingPosts,
+                  self).__init__(('id', 'date-gmt', 'regular-title'),
+                                 vim_vars)
+
+        def client_call__getPost(self, client):
+            return client.get_posts("text", self.id_date_title_tags)
+
+        def open_row(self, n):
+            id = self.post_data[n]['id']
+            return BlogIt.WordPressPage(id, vim_vars=self.vim_vars)
+
+
+    class Prefetcher(object):
+        """ Fetches posts in the background, before they are opened.
+
+        Posts are fetched by up to jobs threads. Each call to want() replaces
+        the queue: posts wanted before but not started yet are dropped. The
+        answers are kept for max_age seconds, at most size of them. They are
+        opened to be edited and sent back, so max_age is short: an older
+        answer could undo changes made meanwhile on the server. want() fetches
+        the expired ones again.
+
+        >>> mock('vim.mocked_eval', tracker=None)
+        >>> prefetcher = BlogIt.Prefetcher()
+        >>> post = BlogIt.WordPressBlogPost(42)
+        >>> post.fetcher = lambda with_terms: lambda: 'fetched 42'
+        >>> prefetcher.want([post])
+        >>> mock('post.set_fetched')
+        >>> prefetcher.getPost(post)
+        Called post.set_fetched('fetched 42')
+        >>> mock('post.getPost')
+        >>> prefetcher.getPost(post)
+        Called post.getPost()
+        >>> prefetcher.fetched[prefetcher.key(post)] = (time() - 11, 'old')
+        >>> prefetcher.getPost(post)
+        Called post.getPost()
+        >>> minimock.restore()
+        """
+
+        def __init__(self, jobs=2, size=32, max_age=10):
+            self.jobs = jobs
+            self.size = size
+            self.max_age = max_age
+            self.fetched = collections.OrderedDict()    # key: (time, answer)
+            self.queue = collections.OrderedDict()      # key: fetch
+            self.running = set()
+            self.workers = 0
+            self.lock = threading.Condition()
+
+        @staticmethod
+        def key(post):
+            return (type(post).__name__, post.vim_vars.blog_name,
+                    post.BLOG_POST_ID)
+
+        def want(self, posts, with_terms=False):
+            """ Fetches posts (most wanted first) unless already fetched. """
+            self.lock.acquire()
+            try:
+                self.expire()
+                self.queue.clear()
+                for post in posts:
+                    key = self.key(post)
+                    if key not in self.fetched and key not in self.running:
+                        self.queue[key] = post.fetcher(with_terms)
+                while self.workers < min(self.jobs, len(self.queue)):
+                    self.workers += 1
+                    worker = threading.Thread(target=self.work)
+                    worker.daemon = True
+                    worker.start()
+            finally:
+                self.lock.release()
+
+        def work(self):
+            while True:
+                self.lock.acquire()
+                try:
+                    if not self.queue:
+                        self.workers -= 1
+                        return
+                    key, fetch = self.queue.popitem(last=False)
+                    self.running.add(key)
+                finally:
+                    self.lock.release()
+                try:
+                    answer = fetch()
+                except Exception:
+                    answer = None    # Opening the post will report it.
+                self.lock.acquire()
+                try:
+                    self.running.discard(key)
+                    if answer is not None:
+                        self.fetched[key] = (time(), answer)
+                        while len(self.fetched) > self.size:
+                            self.fetched.popitem(last=False)
+                    self.lock.notify_all()
+                finally:
+                    self.lock.release()
+
+        def expire(self):
+            for key, (fetched, answer) in self.fetched.items():
+                if time() - fetched > self.max_age:
+                    del self.fetched[key]
+
+        def clear(self):
+            self.lock.acquire()
+            try:
+                self.queue.clear()
+                self.fetched.clear()
+            finally:
+                self.lock.release()
+
+        def getPost(self, post):
+            """ Like post.getPost(), but takes the prefetched answer if any.
+
+            Waits for the answer if the post is being fetched right now.
+            """
+            key = self.key(post)
+            self.lock.acquire()
+            try:
+                fetch = self.queue.pop(key, None)
+                while key in self.running:
+                    self.lock.wait(0.1)
+                self.expire()
+                answer = self.fetched.pop(key, (None, None))[1]
+            finally:
+                self.lock.release()
+            if answer is None and fetch is not None:
+                answer = fetch()
+            if answer is None:
+                post.getPost()
+            else:
+                post.set_fetched(answer)
+
+
+    class PostModel(object):
+
+        def __init__(self, post_data, meta_data_dict, headers, post_body):
+            self.post_data = post_data
+            self.meta_data_dict = meta_data_dict
+            self.headers = headers
+            self.post_body = post_body
+
+
+    class AbstractPost(AbstractBufferIO):
+        BLOG_POST_ID = ''
+
+        class BlogItServerVarUndefined(Exception):
+
+            def __init__(self, label):
+                super(BlogIt.AbstractPost.BlogItServerVarUndefined,
+                      self).__init__('Unknown: %s.' % label)
+                self.label = label
+
+        def __init__(self, post_data={}, meta_data_dict={}, headers=[],
+                     post_body=''):
+            """
+            >>> BlogIt.AbstractPost(headers=['a', 'b', 'c']).meta_data_dict
+            {'Body': '', 'a': 'a', 'c': 'c', 'b': 'b'}
+            """
+            self.post_data = post_data
+            self.new_post_data = {}
+            self.meta_data_dict = {'Body': post_body}
+            for h in headers:
+                self.meta_data_dict[h] = h
+            self.meta_data_dict.update(meta_data_dict)
+            self.meta_data_dict['Body'] = post_body
+            self.HEADERS = headers
+            self.POST_BODY = post_body   # for transition
+
+        def spill(self):
+            """
+            >>> p = BlogIt.AbstractPost({'postid': 1})
+            >>> p.read_post(['', 'Text'])
+            {'': 'Text'}
+            >>> state = p.spill(); p.post_data, p.new_post_data
+            (None, None)
+            >>> p.unspill(state); p.post_data, p.new_post_data
+            ({'postid': 1}, {'': 'Text'})
+            """
+            state = self.spill_state()
+            self.post_data = self.new_post_data = None
+            return state
+
+        def spill_state(self):
+            return (self.post_data, self.new_post_data)
+
+        def unspill(self, state):
+            self.post_data, self.new_post_data = state
+
+        def __getattr__(self, name):
+            """
+
+            >>> p = BlogIt.AbstractPost()
+            >>> mock('p.get_server_var_default', tracker=None)
+            >>> mock('p.display_header_default', tracker=None)
+            >>> p.get_server_var__foo() == p.get_server_var_default('foo')
+            True
+            >>> p.get_server_var__A() == p.get_server_var_default('A')
+            True
+            >>> p.display_header__A() == p.display_header_default('A')
+            True
+            >>> minimock.restore()
+            """
+
+            def base_name():
+                start = name.find('__') + 2
+                return name[start:]
+            if name.startswith('get_server_var__'):
+                return lambda: self.get_server_var_default(base_name())
+            elif name.startswith('set_server_var__'):
+                return lambda val: \
+                        self.set_server_var_default(base_name(), val)
+            elif name.startswith('display_header__'):
+                return lambda: self.display_header_default(base_name())
+            elif name.startswith('read_header__'):
+                return lambda val: self.read_header_default(base_name(), val)
+            raise AttributeError
+
+        def read_header(self, line):
+            """ Reads the meta-data line as used in a vim buffer.
+
+            >>> mock('BlogIt.AbstractPost.read_header_default')
+            >>> BlogIt.AbstractPost().read_header('tag: value')
+            Called BlogIt.AbstractPost.read_header_default('tag', u'value')
+            >>> minimock.restore()
+            """
+            r = re.compile('^(.*?): (.*)$')
+            m = r.match(line)
+            label, v = m.group(1, 2)
+            getattr(self, 'read_header__' + label)(unicode(v.strip(), 'utf-8'))
+
+        def read_body(self, lines):
+            r"""
+            >>> mock('BlogIt.AbstractPost.read_header_default')
+            >>> BlogIt.AbstractPost().read_body(['one', 'two'])
+            Called BlogIt.AbstractPost.read_header_default('Body', 'one\ntwo')
+            >>> minimock.restore()
+            """
+            self.read_header__Body('\n'.join(lines).strip())
+
+        def read_post(self, lines):
+            r""" Returns the dict from given text of the post.
+
+            >>> BlogIt.AbstractPost(post_body='content', headers=['Tag']
+            ...                    ).read_post(['Tag:  Value  ', '',
+            ...                                 'Some Text', 'in two lines.' ])
+            {'content': 'Some Text\nin two lines.', 'Tag': u'Value'}
+            """
+            self.set_server_var__Body('')
+            for i, line in enumerate(lines):
+                if line.strip() == '':
+                    self.read_body(lines[i + 1:])
+                    break
+                self.read_header(line)
+            return self.new_post_data
+
+        def display(self):
+            for label in self.HEADERS:
+                yield self.display_header(label)
+            yield ''
+            for line in self.display_body():
+                yield line
+
+        def display_header(self, label):
+            """
+            Returns a header line formated as it will be displayed to the user.
+
+            >>> blogit.AbstractPost().display_header('A')
+            'A: <A>'
+            >>> blogit.AbstractPost(meta_data_dict={'A': 'a'}
+            ...                    ).display_header('A')
+            'A: <A>'
+            >>> blogit.AbstractPost(post_data={'b': 'two'},
+            ...     meta_data_dict={'A': 'a'}).display_header('A')
+            'A: <A>'
+            >>> blogit.AbstractPost(post_data={'a': 'one', 'b': 'two'},
+            ...     meta_data_dict={'A': 'a'}).display_header('A')
+            'A: one'
+
+            >>> class B(BlogIt.AbstractPost):
+            ...     def display_header__to_be_tested(self):
+            ...         return 'text'
+            >>> B().display_header('to_be_tested')
+            'to_be_tested: text'
+
+            >>> BlogIt.AbstractPost().display_header__foo()
+            '<foo>'
+            """
+            text = getattr(self, 'display_header__' + label)()
+            return '%s: %s' % (label, unicode(text).encode('utf-8'))
+
+        def display_header_default(self, label):
+            return getattr(self, 'get_server_var__' + label)()
+
+        def read_header_default(self, label, text):
+            getattr(self, 'set_server_var__' + label)(text.strip())
+
+        def get_server_var_default(self, label):
+            """
+
+            >>> BlogIt.AbstractPost().get_server_var_default('foo')
+            '<foo>'
+            >>> BlogIt.AbstractPost().get_server_var_default('foo_AS_bar'
+            ... )     #doctest: +ELLIPSIS
+            Traceback (most recent call last):
+                ...
+            BlogItServerVarUndefined: Unknown: foo_AS_bar.
+            """
+            try:
+                try:
+                    return self.post_data[self.meta_data_dict[label]]
+                except KeyError:
+                    return self.post_data[label]
+            except KeyError:
+                if '_AS_' in label:
+                    raise self.BlogItServerVarUndefined(label)
+                else:
+                    return self.get_server_var_not_found(label)
+
+        def get_server_var_not_found(self, label):
+            return '<%s>' % label
+
+        def get_server_var_different_type(self, label, from_type):
+            """
+            >>> blogit.AbstractPost(post_data={'a': 'one, two, three' },
+            ...     meta_data_dict={'Tags': 'a'}).display_header('Tags')
+            'Tags: one, two, three'
+            >>> blogit.AbstractPost({'a': [ 'one', 'two', 'three' ]},
+            ...                     {'Tags_AS_list': 'a'}
+            ...                    ).display_header('Tags')
+            'Tags: one, two, three'
+            >>> blogit.AbstractPost({}).display_header('Tags')
+            'Tags: <Tags>'
+            """
+            try:
+                val = getattr(self, 'get_server_var__%s_AS_%s' %
+                                    (label, from_type))()
+            except self.BlogItServerVarUndefined:
+                return self.get_server_var_default(label)
+            else:
+                return getattr(self, 'server_var_from__' + from_type)(val)
+
+        def set_server_var_different_type(self, label, from_type, str_val):
+            """
+            >>> p = blogit.AbstractPost(post_data={'a': 'b'},
+            ...     meta_data_dict={'Tags': 'a'})
+            >>> p.set_server_var__Tags('one, two, three')
+            >>> p.new_post_data
+            {'a': 'one, two, three'}
+            >>> p = blogit.AbstractPost({'a': [ 'b' ]},
+            ...                         {'Tags_AS_list': 'a'})
+            >>> p.set_server_var__Tags('one, two, three')
+            >>> p.new_post_data
+            {'a': ['one', 'two', 'three']}
+            """
+            val = getattr(self, 'server_var_to__' + from_type)(str_val)
+            try:
+                getattr(self, 'set_server_var__%s_AS_%s' % (label,
+                                                            from_type))(val)
+            except self.BlogItServerVarUndefined:
+                self.set_server_var_default(label, str_val)
+
+        def get_server_var__Date(self):
+            return self.get_server_var_different_type('Date', 'DateTime')
+
+        def set_server_var__Date(self, val):
+            try:
+                self.set_server_var_different_type('Date', 'DateTime', val)
+            except ValueError:
+                pass
+
+        def get_server_var__Categories(self):
+            return self.get_server_var_different_type('Categories', 'list')
+
+        def set_server_var__Categories(self, val):
+            self.set_server_var_different_type('Categories', 'list', val)
+
+        def get_server_var__Tags(self):
+            return self.get_server_var_different_type('Tags', 'list')
+
+        def set_server_var__Tags(self, val):
+            self.set_server_var_different_type('Tags', 'list', val)
+
+        def server_var_to__DateTime(self, str_val):
+            return BlogIt.str_to_DateTime(str_val)
+
+        def server_var_from__DateTime(self, val):
+            return BlogIt.DateTime_to_str(val)
+
+        def server_var_to__list(self, str_val):
+            return [s.strip() for s in str_val.split(',')]
+
+        def server_var_from__list(self, val):
+            return ', '.join(val)
+
+        def set_server_var_default(self, label, val):
+            try:
+                self.new_post_data[self.meta_data_dict[label]] = val
+            except KeyError:
+                raise self.BlogItServerVarUndefined(label)
+
+
+    class BlogPost(AbstractPost):
+        POST_TYPE = 'post'
+
+        def __init__(self, blog_post_id, post_data={}, meta_data_dict={},
+                     headers=None, post_body='description', vim_vars=None):
+            if headers is None:
+                headers = ['From', 'Id', 'Subject', 'Status',
+                           'Categories', 'Tags', 'Date']
+            if vim_vars is None:
+                vim_vars = BlogIt.VimVars()
+            super(BlogIt.BlogPost, self).__init__(post_data, meta_data_dict,
+                     headers, post_body)
+            self.vim_vars = vim_vars
+            self.BLOG_POST_ID = blog_post_id
+
+        def display_header__Status(self):
+            d = self.get_server_var__Status_AS_dict()
+            if d == '':
+                return u'new'
+            comment_typ_count = ['%s %s' % (d[key], text)
+                    for key, text in (('awaiting_moderation', 'awaiting'),
+                                      ('spam', 'spam'))
+                    if d[key] > 0]
+            if comment_typ_count == []:
+                s = u''
+            else:
+                s = u' (%s)' % ', '.join(comment_typ_count)
+            return (u'%(post_status)s \u2013 %(total_comments)s Comments'
+                    + s) % d
+
+        def init_vim_buffer(self):
+            super(BlogIt.BlogPost, self).init_vim_buffer()
+            vim.command('nnoremap <buffer> gf :Blogit! list_comments<cr>')
+            vim.command('setlocal ft=mail textwidth=0 ' +
+                                 'completefunc=BlogItComplete')
+            vim.current.window.cursor = (8, 0)
+
+        @staticmethod
+        def split_more(lines):
+            """ Returns the lines of the body before and after <!--more-->.
+
+            Blank lines around the body are left out.
+
+            >>> BlogIt.BlogPost.split_more(['', 'one', '', '<!--more-->', '',
+            ...                             'two', ''])
+            [['one', ''], ['two']]
+            >>> BlogIt.BlogPost.split_more(['<!--more-->', '', 'one'])
+            [['<!--more-->', '', 'one']]
+            """
+            lines = BlogIt.strip_lines(lines)
+            for i in xrange(1, len(lines) - 1):
+                if lines[i] == '<!--more-->' and lines[i + 1] == '':
+                    return [lines[:i], lines[i + 2:]]
+            return [lines]
+
+        def read_body(self, lines):
+            r""" Formats the lines of the body straight into the post.
+
+            >>> mock('BlogIt.BlogPost.format', tracker=None,
+            ...      returns_func=lambda lines: '\n'.join(lines).upper())
+            >>> p = BlogIt.BlogPost('')
+            >>> p.read_body(['', 'text', '']); p.new_post_data
+            {'description': 'TEXT'}
+            >>> minimock.restore()
+            """
+            sections = self.split_more(lines)
+            self.set_server_var__Body(self.format(sections[0]))
+            if len(sections) == 2:
+                self.read_header__Body_mt_more(self.format(sections[1]))
+
+        def unformat(self, lines):
+            r""" Returns the lines of the buffer for the lines of a body.
+
+            Can raise FilterException.
+
+            >>> mock('vim.mocked_eval', returns_iter=[ '1', 'tr a-z A-Z' ])
+            >>> BlogIt.BlogPost(42).unformat(['some', 'random text'])
+            Called vim.mocked_eval("exists('blogit_unformat')")
+            Called vim.mocked_eval('blogit_unformat')
+            ['SOME', 'RANDOM TEXT']
+
+            >>> BlogIt.BlogPost(42).unformat(['', '', ' ',
+            ...         '<!--blogit-- Post Source --blogit--> <h1>HTML</h1>'])
+            ['Post Source']
+            >>> BlogIt.BlogPost(42).unformat(['<!--blogit--', 'Post',
+            ...         'Source', '--blogit-->', '<p>Post</p>'])
+            ['Post', 'Source']
+
+            >>> minimock.restore()
+            """
+            lines, blank = iter(lines), []
+            for line in lines:
+                if line.strip() != '':
+                    break
+                blank.append(line)
+            else:
+                return []
+            if line.lstrip().startswith('<!--blogit--'):
+                return self.post_source(line, lines)
+            lines = itertools.chain(blank, [line], lines)
+            return list(BlogIt.split_lines(self.filter(lines, 'unformat')))
+
+        @staticmethod
+        def post_source(first, lines):
+            """ Returns the lines between <!--blogit-- and --blogit-->. """
+            source = []
+            for line in itertools.chain([first.split('<!--blogit--', 1)[1]],
+                                        lines):
+                end = line.find('--blogit-->')
+                if end != -1:
+                    source.append(line[:end])
+                    break
+                source.append(line)
+            source[0] = source[0].lstrip()
+            source[-1] = source[-1].rstrip()
+            return BlogIt.strip_lines(source)
+
+        def format(self, lines):
+            r""" Returns the text of the post for a list of buffer lines.
+
+            Can raise FilterException.
+
+            >>> mock('vim.mocked_eval')
+
+            >>> blogit.BlogPost(42).format(['one', 'two', 'tree', 'four'])
+            Called vim.mocked_eval("exists('blogit_format')")
+            Called vim.mocked_eval("exists('blogit_postsource')")
+            'one\ntwo\ntree\nfour'
+
+            >>> mock('vim.mocked_eval', returns_iter=['1', 'sort', '0'])
+            >>> blogit.BlogPost(42).format(['one', 'two', 'tree', 'four'])
+            Called vim.mocked_eval("exists('blogit_format')")
+            Called vim.mocked_eval('blogit_format')
+            Called vim.mocked_eval("exists('blogit_postsource')")
+            'four\none\ntree\ntwo\n'
+
+            >>> mock('vim.mocked_eval', returns_iter=['1', 'false'])
+            >>> blogit.BlogPost(42).format(['one', 'two', 'tree', 'four'])
+            Traceback (most recent call last):
+                ...
+            FilterException
+
+            >>> minimock.restore()
+            """
+            formated = ''.join(self.filter(lines, 'format'))
+            if self.vim_vars.blog_postsource:
+                formated = "<!--blogit--\n%s\n--blogit-->\n%s" % (
+                        '\n'.join(lines), formated)
+            return formated
+
+        def filter(self, lines, vim_var='format'):
+            r""" Filter lines with command in vim_var.
+
+            Yields the text of the output in chunks, as the command writes
+            them. Lines are fed to the command while it runs, so neither the
+            input nor the output is held as a whole.
+
+            Can raise FilterException.
+
+            >>> mock('vim.mocked_eval')
+            >>> ''.join(BlogIt.BlogPost(42).filter(['some random text']))
+            Called vim.mocked_eval("exists('blogit_format')")
+            'some random text'
+
+            >>> mock('vim.mocked_eval', returns_iter=[ '1', 'false' ])
+            >>> ''.join(BlogIt.BlogPost(42).filter(['some random text']))
+            Traceback (most recent call last):
+                ...
+            FilterException
+
+            >>> mock('vim.mocked_eval', returns_iter=[ '1', 'rev' ])
+            >>> ''.join(BlogIt.BlogPost(42).filter([]))
+            Called vim.mocked_eval("exists('blogit_format')")
+            Called vim.mocked_eval('blogit_format')
+            ''
+
+            >>> mock('vim.mocked_eval', returns_iter=[ '1', 'rev' ])
+            >>> ''.join(BlogIt.BlogPost(42).filter(['some random text']))
+            Called vim.mocked_eval("exists('blogit_format')")
+            Called vim.mocked_eval('blogit_format')
+            'txet modnar emos\n'
+
+            >>> mock('vim.mocked_eval', returns_iter=[ '1', 'rev' ])
+            >>> ''.join(BlogIt.BlogPost(42).filter(
+            ...         ['some random text', 'with a second line']))
+            Called vim.mocked_eval("exists('blogit_format')")
+            Called vim.mocked_eval('blogit_format')
+            'txet modnar emos\nenil dnoces a htiw\n'
+
+            >>> minimock.restore()
+
+            """
+            filter = self.vim_vars.vim_variable(vim_var)
+            if filter is None:
+                return BlogIt.join_lines(lines)
+            return BlogIt.pipe(filter, BlogIt.join_lines(lines))
+
+        def upload_media(self, lines, base_dir='.', index=None):
+            """
+            >>> mock('vim.mocked_eval', tracker=None)
+            >>> mock('BlogIt.MediaUploader.upload', returns=['uploaded'])
+            >>> BlogIt.BlogPost(42).upload_media(['![a](/etc/passwd)'])
+            Called BlogIt.MediaUploader.upload(['![a](/etc/passwd)'])
+            ['uploaded']
+            >>> BlogIt.BlogPost(42).upload_media(['![a](http://x/a.png)'])
+            ['![a](http://x/a.png)']
+            >>> minimock.restore()
+            """
+            if not BlogIt.MediaUploader.find_local_media(lines, base_dir):
+                return lines    # Not even the index needs to be read.
+            return BlogIt.MediaUploader(self.vim_vars, base_dir,
+                                        index).upload(lines)
+
+        def display_body(self):
+            r"""
+            Yields the lines of a post body.
+
+            >>> mock('vim.mocked_eval', returns_iter=[ '1', 'false' ])
+            >>> mock('sys.stderr')
+            >>> list(BlogIt.BlogPost(42, {'description': 'some random text'}
+            ...                     ).display_body())
+            ...         #doctest: +NORMALIZE_WHITESPACE
+            Called vim.mocked_eval("exists('blogit_unformat')")
+            Called vim.mocked_eval('blogit_unformat')
+            Called sys.stderr.write('Blogit: Error happend while filtering
+                    with:false\n')
+            ['some random text']
+            >>> minimock.restore()
+            """
+            for line in self.display_text(self.post_data.get(self.POST_BODY,
+                                                             '')):
+                yield line
+
+            if self.post_data.get('mt_text_more'):
+                yield ''
+                yield '<!--more-->'
+                yield ''
+                for line in self.display_text(self.post_data["mt_text_more"]):
+                    yield line
+
+        def display_text(self, text):
+            """ Returns the unformated lines of text, or else those of text. """
+            try:
+                return self.unformat(BlogIt.split_lines([text]))
+            except BlogIt.FilterException, e:
+                sys.stderr.write(e.message)
+                return BlogIt.split_lines([text])
+
+
+    class WordPressBlogPost(BlogPost):
+
+        def __init__(self, blog_post_id, post_data={}, meta_data_dict=None,
+                     headers=None, post_body='description', vim_vars=None,
+                     client=None):
+            if meta_data_dict is None:
+                meta_data_dict = {'From': 'wp_author_display_name',
+                                  'Id': 'postid',
+                                  'Subject': 'title',
+                                  'Categories_AS_list': 'categories',
+                                  'Tags': 'mt_keywords',
+                                  'Date_AS_DateTime': 'date_created_gmt',
+                                  'Status_AS_dict': 'blogit_status',
+                                 }
+            super(BlogIt.WordPressBlogPost,
+                  self).__init__(blog_post_id, post_data, meta_data_dict,
+                                 headers, post_body, vim_vars)
+            if client is None:
+                client = BlogIt.server_proxy(self.vim_vars)
+            self.client = client
+
+        def do_send(self, push=None):
+            """ Send post to server.
+
+            >>> mock('sys.stderr')
+            >>> p = BlogIt.WordPressBlogPost(42,
+            ...         {'post_status': 'new', 'postid': 42})
+            >>> mock('p.client'); mock('p.getPost'); mock('p.display')
+            >>> mock('vim.mocked_eval', tracker=None)
+            >>> p.send(['', 'text'])    #doctest: +NORMALIZE_WHITESPACE
+            Called p.client.metaWeblog.editPost( 42, 'user', 'password',
+                    {'post_status': 'new', 'postid': 42,
+                     'description': 'text'}, 0)
+            Called p.getPost()
+            >>> minimock.restore()
+            """
+
+            def sendPost(push):
+                """ Unify newPost and editPost from the metaWeblog API. """
+                if self.BLOG_POST_ID == '':
+                    self.BLOG_POST_ID = self.client.metaWeblog.newPost('',
+                            self.vim_vars.blog_username,
+                            self.vim_vars.blog_password, self.post_data, push)
+                    self.created()
+                else:
+                    self.client.metaWeblog.editPost(self.BLOG_POST_ID,
+                            self.vim_vars.blog_username,
+                            self.vim_vars.blog_password, self.post_data, push)
+
+            if push == 0 or self.get_server_var__post_status() == 'draft':
+                self.set_server_var__Date_AS_DateTime(DateTime())
+            self.post_data.update(self.new_post_data)
+            push_dict = {0: 'draft', 1: 'publish',
+                         None: self.post_data['post_status']}
+            self.post_data['post_status'] = push_dict[push]
+            if push is None:
+                push = 0
+            try:
+                sendPost(push)
+            except Fault, e:
+                self.send_failed(e)
+            self.getPost()
+
+        def send_failed(self, fault):
+            """ Reports that the server refused the post. """
+            sys.stderr.write(fault.faultString)
+
+        def created(self):
+            """ Called as soon as newPost gave the post its BLOG_POST_ID. """
+
+        def getPost(self):
+            """
+            >>> mock('xmlrpclib.MultiCall', returns=Mock(
+            ...         'multicall', returns=[{'post_status': 'draft'}, {}]))
+            >>> mock('vim.mocked_eval')
+
+            >>> p = BlogIt.WordPressBlogPost(42)
+            >>> p.getPost()    #doctest: +NORMALIZE_WHITESPACE
+            Called vim.mocked_eval('s:used_tags == [] ||
+                                    s:used_categories == []')
+            Called xmlrpclib.MultiCall(<ServerProxy for example.com/RPC2>)
+            Called multicall.metaWeblog.getPost(42, 'user', 'password')
+            Called multicall.wp.getCommentCount('', 'user', 'password', 42)
+            Called multicall()
+            >>> sorted(p.post_data.items())    #doctest: +NORMALIZE_WHITESPACE
+            [('blogit_status', {'post_status': 'draft'}),
+             ('post_status', 'draft')]
+            >>> minimock.restore()
+
+            """
+            with_terms = vim.eval('s:used_tags == [] || '
+                                  's:used_categories == []') == '1'
+            self.set_fetched(self.fetcher(with_terms)())
+
+        def fetcher(self, with_terms=False):
+            """ Returns a function getting the post from the server.
+
+            The function doesn't use vim, so it can run in any thread. Pass
+            what it returns to set_fetched. With with_terms, the categories
+            and tags of the blog are fetched too.
+            """
+            username = self.vim_vars.blog_username
+            password = self.vim_vars.blog_password
+            client, post_id = self.client, self.BLOG_POST_ID
+
+            def fetch():
+                multicall = xmlrpclib.MultiCall(client)
+                multicall.metaWeblog.getPost(post_id, username, password)
+                multicall.wp.getCommentCount('', username, password, post_id)
+                if with_terms:
+                    multicall.wp.getCategories('', username, password)
+                    multicall.wp.getTags('', username, password)
+                return tuple(multicall())
+            return fetch
+
+        def set_fetched(self, answer):
+            d, comments = answer[:2]
+            if len(answer) == 4:
+                categories, tags = answer[2:]
+                vim.command('let s:used_tags = %s' % BlogIt.to_vim_list(
+                        [tag['name'] for tag in tags]))
+                vim.command('let s:used_categories = %s' %
+                            BlogIt.to_vim_list([cat['categoryName']
+                                                    for cat in categories]))
+            comments['post_status'] = d['post_status']
+            d['blogit_status'] = comments
+            self.post_data = d
+
+        @classmethod
+        def create_new_post(cls, vim_vars, body_lines=['']):
+            """
+            >>> mock('vim.command', tracker=None)
+            >>> mock('vim.mocked_eval', tracker=None)
+            >>> BlogIt.WordPressBlogPost.create_new_post(BlogIt.VimVars()
+            ... )     #doctest: +ELLIPSIS
+            <testing.blogit.WordPressBlogPost object at 0x...>
+            >>> minimock.restore()
+            """
+            b = cls.blank(vim_vars)
+            b.init_vim_buffer()
+            if body_lines != ['']:
+                vim.current.buffer[-1:] = body_lines
+            return b
+
+        @classmethod
+        def blank(cls, vim_vars):
+            """ Returns a new draft, without a buffer. """
+            return cls('', post_data={'post_status': 'draft',
+                    'description': '',
+                    'wp_author_display_name': vim_vars.blog_username,
+                    'postid': '', 'categories': [], 'mt_keywords': '',
+                    'date_created_gmt': '', 'title': '',
+                    'Status_AS_dict': {'awaiting_moderation': 0, 'spam': 0,
+                                       'post_status': 'draft',
+                                       'total_comments': 0, }},
+                    vim_vars=vim_vars)
+
+
+    class TumblrBlogPost(BlogPost):
+        pass
+
+
+    class Page(BlogPost):
+        POST_TYPE = 'page'
+
+        def __init__(self, blog_post_id, post_data={}, meta_data_dict={},
+                     headers=None, post_body='description', vim_vars=None,
+                     client=None):
+            if headers is None:
+                headers = ['From', 'Id', 'Subject', 'Status', 'Categories',
+                           'Date']
+            super(BlogIt.Page, self).__init__(blog_post_id, post_data,
+                                              meta_data_dict, headers,
+                                              post_body, vim_vars)
+
+        def read_header__Id(self, text):
+            """
+            >>> mock('BlogIt.BlogPost.set_server_var_default')
+            >>> BlogIt.Page(42).read_header__Id('42 (about)')
+            Called BlogIt.BlogPost.set_server_var_default('Page', 'about')
+            Called BlogIt.BlogPost.set_server_var_default('Id', '42')
+            >>> BlogIt.Page(42).read_header__Id(' (about)')
+            Called BlogIt.BlogPost.set_server_var_default('Page', 'about')
+            Called BlogIt.BlogPost.set_server_var_default('Id', '')
+            >>> minimock.restore()
+            """
+            id, page = re.match('(\d*) *\((.*)\)', text).group(1, 2)
+            self.set_server_var__Page(page)
+            #super(BlogIt.Page, self).read_header__Id(id)
+            BlogIt.BlogPost.read_header_default(self, 'Id', id)
+
+        def display_header__Id(self):
+            """
+            >>> mock('BlogIt.BlogPost.get_server_var_default',
+            ...      returns_iter=[42, 'about'], tracker=None)
+            >>> BlogIt.Page(42).display_header__Id()
+            '42 (about)'
+            >>> minimock.restore()
+            """
+            #super(BlogIt.Page, self).display_header__Id()
+            return '%s (%s)' % (BlogIt.BlogPost.display_header_default(self,
+                                                                       'Id'),
+                                self.get_server_var__Page())
+
+
+    class WordPressPage(Page):
+
+        def __init__(self, blog_post_id, post_data={}, meta_data_dict=None,
+                     headers=None, post_body='description', vim_vars=None,
+                     client=None):
+            if meta_data_dict is None:
+                meta_data_dict = {'From': 'wp_author_display_name',
+                                  'Id': 'page_id',
+                                  'Subject': 'title',
+                                  'Categories_AS_list': 'categories',
+                                  'Date_AS_DateTime': 'dateCreated',
+                                  'Status_AS_dict': 'blogit_status',
+                                  'Page': 'wp_slug',
+                                  'Status_post': 'page_status',
+                                 }
+            super(BlogIt.WordPressPage,
+                  self).__init__(blog_post_id, post_data, meta_data_dict,
+                                 headers, post_body, vim_vars)
+            if client is None:
+                client = BlogIt.server_proxy(self.vim_vars)
+            self.client = client
+
+        def do_send(self, push=None):
+            if push == 1:
+                self.set_server_var__Date_AS_DateTime(DateTime())
+                self.set_server_var__Status_post('publish')
+            elif push == 0:
+                self.set_server_var__Date_AS_DateTime(DateTime())
+                self.set_server_var__Status_post('draft')
+            self.post_data.update(self.new_post_data)
+            if self.BLOG_POST_ID == '':
+                self.BLOG_POST_ID = self.client.wp.newPage('',
+                                                 self.vim_vars.blog_username,
+                                                 self.vim_vars.blog_password,
+                                                 self.post_data)
+            else:
+                self.client.wp.editPage('', self.BLOG_POST_ID,
+                                        self.vim_vars.blog_username,
+                                        self.vim_vars.blog_password,
+                                        self.post_data)
+            self.getPost()
+
+        def getPost(self):
+            self.set_fetched(self.fetcher()())
+
+        def fetcher(self, with_terms=False):
+            """ See WordPressBlogPost.fetcher (pages have no terms). """
+            username = self.vim_vars.blog_username
+            password = self.vim_vars.blog_password
+            client, page_id = self.client, self.BLOG_POST_ID
+
+            def fetch():
+                multicall = xmlrpclib.MultiCall(client)
+                multicall.wp.getPage('', page_id, username, password)
+                multicall.wp.getCommentCount('', username, password, page_id)
+                return tuple(multicall())
+            return fetch
+
+        def set_fetched(self, answer):
+            d, comments = answer
+            comments['post_status'] = d['page_status']
+            d['blogit_status'] = comments
+            self.post_data = d
+
+        @classmethod
+        def create_new_post(cls, vim_vars, body_lines=['']):
+            """
+            >>> mock('vim.command', tracker=None)
+            >>> mock('vim.mocked_eval', tracker=None)
+            >>> BlogIt.WordPressPage.create_new_post(BlogIt.VimVars()
+            ... )     #doctest: +ELLIPSIS
+            <testing.blogit.WordPressPage object at 0x...>
+            >>> minimock.restore()
+            """
+            b = cls('', post_data={'page_status': 'draft', 'description': '',
+                    'wp_author_display_name': vim_vars.blog_username,
+                    'page_id': '', 'wp_slug': '', 'title': '',
+                    'categories': [], 'dateCreated': '',
+                    'Status_AS_dict': {'awaiting_moderation': 0, 'spam': 0,
+                                       'post_status': 'draft',
+                                       'total_comments': 0}},
+                    vim_vars=vim_vars)
+            b.init_vim_buffer()
+            if body_lines != ['']:
+                vim.current.buffer[-1:] = body_lines
+            return b
+
+
+    class Comment(AbstractPost):
+
+        def __init__(self, post_data={}, meta_data_dict={}, headers=None,
+                     post_body='content'):
+            if headers is None:
+                headers = ['Status', 'Author', 'ID', 'Parent', 'Date', 'Type']
+            super(BlogIt.Comment, self).__init__(post_data, meta_data_dict,
+                     headers, post_body)
+
+        def display_body(self):
+            """
+            Yields the lines of a post body.
+            """
+            content = self.post_data.get(self.POST_BODY, '')
+            for line in content.split('\n'):
+                # not splitlines to preserve \r\n in comments.
+                yield line
+
+        @classmethod
+        def create_emtpy_comment(cls, *a, **d):
+            c = cls(*a, **d)
+            c.read_post(['Status: new', 'Author: ', 'ID: ', 'Parent: 0',
+                         'Date: ', 'Type: ', '', ''])
+            c.post_data = c.new_post_data
+            return c
+
+
+    class CommentList(Comment):
+        POST_TYPE = 'comments'
+
+        def __init__(self, meta_data_dict={}, headers=None,
+                     post_body='content', comment_categories=None):
+            super(BlogIt.CommentList, self).__init__({}, meta_data_dict,
+                     headers, post_body)
+            if comment_categories is None:
+                comment_categories = ('New', 'In Moderadation', 'Spam',
+                                      'Published')
+            self.comment_categories = comment_categories
+            # IDs of the threads shown in full (None: all of them).
+            self.expanded = None
+            self.empty_comment_list()
+
+        def init_vim_buffer(self):
+            super(BlogIt.CommentList, self).init_vim_buffer()
+            vim.command('setlocal linebreak completefunc=BlogItComplete ' +
+                               'foldmethod=marker ' +
+                               'foldtext=BlogItCommentsFoldText()')
+            if self.expanded is not None:
+                self.init_collapsed_threads()
+
+        def init_collapsed_threads(self):
+            """ Loads collapsed threads in the buffer before they're opened.
+
+            Called again whenever threads start to be collapsed.
+            """
+            for key in ('zo', 'zO', 'za', 'zA', 'zv', 'zR'):
+                vim.command("nnoremap <buffer> <silent> %s :<C-u>call "
+                            "blogit#command('!', 'comments_expand'%s)<bar>"
+                            "execute 'normal! ' . v:count1 . '%s'<cr>" %
+                            (key, key == 'zR' and ", 'all'" or '', key))
+            vim.command('augroup blogit_comments')
+            vim.command('autocmd! * <buffer>')
+            vim.command('autocmd CursorMoved <buffer> '
+                        'Blogit! comments_expand_open')
+            vim.command('augroup END')
+
+        def empty_comment_list(self):
+            self.comment_list = {}
+            self.comments_by_category = {}
+            self._threads = None
+            empty_comment = BlogIt.Comment.create_emtpy_comment({},
+                             self.meta_data_dict, self.HEADERS, self.POST_BODY)
+            self.add_comment('New', empty_comment.post_data)
+
+        def spill(self):
+            """
+            >>> cl = BlogIt.CommentList()
+            >>> cl.add_comment('Spam', {'ID': '1', 'content': 'Text'})
+            >>> lines = list(cl.display())
+            >>> cl.unspill(cl.spill())
+            >>> list(cl.display()) == lines
+            True
+            """
+            state = self.spill_state()
+            self.comment_list = {}
+            self.comments_by_category = {}
+            self._threads = None
+            return state
+
+        def spill_state(self):
+            return [(heading, [c.post_data for c in comments])
+                    for heading, comments in self.comments_by_category.items()]
+
+        def unspill(self, state):
+            for heading, comments in state:
+                for comment_dict in comments:
+                    self.add_comment(heading, comment_dict)
+
+        def add_comment(self, category, comment_dict):
+            """ Callee must garanty that no comment with same id is in list.
+
+            >>> cl = BlogIt.CommentList()
+            >>> cl.add_comment('hold', {'ID': '1',
+            ...                         'content': 'Some Text',
+            ...                         'Status': 'hold'})
+            >>> [ (id, c.post_data) for id, c in cl.comment_list.iteritems()
+            ... ]    #doctest: +NORMALIZE_WHITESPACE +ELLIPSIS
+            [(u'', {'Status': u'new', 'Parent': u'0', 'Author': u'',
+              'content': '', 'Date': u'', 'Type': u'', 'ID': u''}),
+             ('1', {'content': 'Some Text', 'Status': 'hold', 'ID': '1'})]
+            >>> [ (cat, [ c.post_data['ID'] for c in L ])
+            ...         for cat, L in cl.comments_by_category.iteritems()
+            ... ]    #doctest: +NORMALIZE_WHITESPACE
+            [('New', [u'']), ('hold', ['1'])]
+            >>> cl.add_comment('spam', {'ID': '1'}
+            ...               )    #doctest: +ELLIPSIS
+            Traceback (most recent call last):
+                ...
+            AssertionError...
+            """
+            comment = BlogIt.Comment(comment_dict, self.meta_data_dict,
+                                     self.HEADERS, self.POST_BODY)
+            assert not comment.get_server_var__ID() in self.comment_list
+            self.comment_list[comment.get_server_var__ID()] = comment
+            self._threads = None
+            try:
+                self.comments_by_category[category].append(comment)
+            except KeyError:
+                self.comments_by_category[category] = [comment]
+
+        def display(self):
+            """
+
+            >>> list(BlogIt.CommentList().display())
+            ...     #doctest: +NORMALIZE_WHITESPACE
+            ['======================================================================== {{{1',
+             '     New',
+             '======================================================================== {{{2',
+             'Status: new',
+             'Author: ',
+             'ID: ',
+             'Parent: 0',
+             'Date: ',
+             'Type: ',
+             '',
+             '',
+             '']
+            """
+            for heading in self.comment_categories:
+                try:
+                    comments = self.comments_by_category[heading]
+                except KeyError:
+                    continue
+
+                yield 72 * '=' + ' {{{1'
+                yield 5 * ' ' + heading.capitalize()
+
+                if self.expanded is not None:
+                    roots, children = self.threads[heading]
+                    for root in roots:
+                        # The empty comment for writing a new one stays.
+                        if root.get_server_var__ID() in self.expanded or \
+                                root.get_server_var__ID() == '':
+                            lines = self.display_thread(root, children)
+                        else:
+                            lines = self.display_collapsed(root, children)
+                        for line in lines:
+                            yield line
+                    continue
+
+                fold_levels = {}
+                for comment in reversed(comments):
+                    try:
+                        fold = fold_levels[comment.post_data['parent']] + 2
+                    except KeyError:
+                        fold = 2
+                    fold_levels[comment.get_server_var__ID()] = fold
+                    yield 72 * '=' + ' {{{%s' % fold
+                    for line in comment.display():
+                        yield line
+                    yield ''
+
+        @property
+        def threads(self):
+            """ Maps categories to their thread roots and the comments
+            answering each comment (by ID), in the order they are displayed.
+            """
+            if self._threads is None:
+                self._threads = {}
+                for heading, comments in self.comments_by_category.items():
+                    ids = set(c.get_server_var__ID() for c in comments)
+                    roots, children = [], {}
+                    for comment in reversed(comments):
+                        parent = comment.post_data.get('parent')
+                        if parent in ids and \
+                                parent != comment.get_server_var__ID():
+                            children.setdefault(parent, []).append(comment)
+                        else:
+                            roots.append(comment)
+                    self._threads[heading] = (roots, children)
+            return self._threads
+
+        def display_thread(self, comment, children, fold=2):
+            """ Yields the lines of comment and of all answers to it. """
+            yield 72 * '=' + ' {{{%s' % fold
+            for line in comment.display():
+                yield line
+            yield ''
+            for child in children.get(comment.get_server_var__ID(), []):
+                for line in self.display_thread(child, children, fold + 2):
+                    yield line
+
+        def thread_size(self, comment, children):
+            return 1 + sum(self.thread_size(child, children)
+                           for child in children.get(
+                                   comment.get_server_var__ID(), []))
+
+        def display_collapsed(self, comment, children):
+            r""" Yields a placeholder of the thread starting with comment.
+
+            BlogItCommentsFoldText() shows its last line, the start of the
+            first comment. read_post skips placeholders.
+
+            >>> cl = BlogIt.CommentList()
+            >>> cl.add_comment('hold', {'ID': '1', 'content': 'Hi\nthere'})
+            >>> cl.add_comment('hold', {'ID': '2', 'parent': '1'})
+            >>> roots, children = cl.threads['hold']
+            >>> list(cl.display_collapsed(roots[0], children))
+            ...     #doctest: +NORMALIZE_WHITESPACE
+            ['======================================================================== {{{2',
+             'Thread: 1 (2 comments)', '', 'Hi']
+            """
+            yield 72 * '=' + ' {{{2'
+            yield 'Thread: %s (%d comments)' % (
+                    comment.get_server_var__ID(),
+                    self.thread_size(comment, children))
+            yield ''
+            yield comment.display_body().next()
+
+        def expand(self, thread_id):
+            """ Returns the lines replacing the placeholder of a thread.
+
+            >>> cl = BlogIt.CommentList()
+            >>> cl.expanded = set()
+            >>> cl.add_comment('hold', {'ID': '1', 'content': 'Hi'})
+            >>> cl.add_comment('hold', {'ID': '2', 'parent': '1'})
+            >>> [line[-5:] for line in cl.expand('1')
+            ...  if line.startswith('=') or line.startswith('ID: ')]
+            [' {{{2', 'ID: 1', ' {{{4', 'ID: 2']
+            >>> cl.expanded
+            set(['1'])
+            """
+            for roots, children in self.threads.values():
+                for root in roots:
+                    if unicode(root.get_server_var__ID()) == thread_id:
+                        self.expanded.add(root.get_server_var__ID())
+                        return list(self.display_thread(root, children))
+            raise KeyError(thread_id)
+
+        def _read_post__read_comment(self, lines):
+            self.new_post_data = {}
+            new_post_data = super(BlogIt.CommentList, self).read_post(lines)
+            return BlogIt.Comment(new_post_data, self.meta_data_dict,
+                                  self.HEADERS, self.POST_BODY)
+
+        def read_post(self, lines):
+            r""" Yields a dict for each comment in the current buffer.
+
+            >>> cl = BlogIt.CommentList().read_post([
+            ...     60 * '=', 'ID: 1 ', 'Status: hold', '', 'Text',
+            ...     60 * '=', 'ID:  ', 'Status: hold', '', 'Text',
+            ...     60 * '=', 'ID: 3', 'Status: spam', '', 'Text' ])
+            >>> [ c.post_data for c in cl ]     #doctest: +NORMALIZE_WHITESPACE
+            [{'content': 'Text', 'Status': u'hold', 'ID': u'1'},
+             {'content': 'Text', 'Status': u'hold', 'ID': u''},
+             {'content': 'Text', 'Status': u'spam', 'ID': u'3'}]
+            >>> cl = BlogIt.CommentList().read_post([
+            ...     60 * '=', 'ID: 1 ', 'Status: hold', '', 'Text',
+            ...     60 * '=', 'Thread: 2 (3 comments)', '', 'Text' ])
+            >>> [ c.post_data for c in cl ]     #doctest: +NORMALIZE_WHITESPACE
+            [{'content': 'Text', 'Status': u'hold', 'ID': u'1'}]
+
+            >>> mock('BlogIt.Comment.create_emtpy_comment',
+            ...      returns=BlogIt.Comment(headers=['Tag', 'Tag2']))
+            >>> cl = BlogIt.CommentList(headers=['Tag', 'Tag2']).read_post([
+            ...     60 * '=', 'Tag2: Val2 ', '',
+            ...     60 * '=',
+            ...     'Tag:  Value  ', '', 'Some Text', 'in two lines.   ' ])
+            Called BlogIt.Comment.create_emtpy_comment(
+                {},
+                {'Body': 'content', 'Tag': 'Tag', 'Tag2': 'Tag2'},
+                ['Tag', 'Tag2'],
+                'content')
+            >>> [ c.post_data for c in cl ]     #doctest: +NORMALIZE_WHITESPACE
+            [{'content': '', 'Tag2': u'Val2'},
+             {'content': 'Some Text\nin two lines.', 'Tag': u'Value'}]
+            >>> minimock.restore()
+            """
+            j = 0
+            lines = list(lines)
+            for i, line in enumerate(lines):
+                if line.startswith(60 * '='):
+                    if i - j > 1 and not self.is_collapsed(lines[j:i]):
+                        yield self._read_post__read_comment(lines[j:i])
+                    j = i + 1
+            if not self.is_collapsed(lines[j:]):
+                yield self._read_post__read_comment(lines[j:])
+
+        @staticmethod
+        def is_collapsed(lines):
+            """ True if lines are the placeholder of a collapsed thread. """
+            return lines[:1] != [] and lines[0].startswith('Thread: ')
+
+        def changed_comments(self, lines):
+            """ Yields comments with changes made to in the vim buffer.
+
+            >>> cl = BlogIt.CommentList()
+            >>> for comment_dict in [
+            ...         {'ID': '1', 'content': 'Old Text',
+            ...          'Status': 'hold', 'unknown': 'tag'},
+            ...         {'ID': '2', 'content': 'Same Text',
+            ...          'Date': 'old', 'Status': 'hold'},
+            ...         {'ID': '3', 'content': 'Same Again',
+            ...          'Status': 'hold'}]:
+            ...     cl.add_comment('', comment_dict)
+            >>> [ c.post_data for c in cl.changed_comments([
+            ...     60 * '=', 'ID: 1 ', 'Status: hold', '', 'Changed Text',
+            ...     60 * '=', 'ID:  ', 'Status: hold', '', 'New Text',
+            ...     60 * '=', 'ID: 2', 'Status: hold', 'Date: new', '',
+            ...             'Same Text',
+            ...     60 * '=', 'ID: 3', 'Status: spam', '', 'Same Again' ])
+            ... ]      #doctest: +NORMALIZE_WHITESPACE +ELLIPSIS
+            [{'content': 'Changed Text', 'Status': u'hold', 'unknown': 'tag',
+              'ID': u'1'},
+             {'Status': u'hold', 'content': 'New Text', 'Parent': u'0',
+              'Author': u'', 'Date': u'', 'Type': u'', 'ID': u''},
+             {'content': 'Same Again', 'Status': u'spam', 'ID': u'3'}]
+
+            """
+
+            for comment in self.read_post(lines):
+                original_comment = self.comment_list[
+                        comment.get_server_var__ID()].post_data
+                new_comment = original_comment.copy()
+                new_comment.update(comment.post_data)
+                if original_comment != new_comment:
+                    comment.post_data = new_comment
+                    yield comment
+
+        @classmethod
+        def create_from_post(cls, blog_post):
+            return cls(blog_post.BLOG_POST_ID, vim_vars=blog_post.vim_vars)
+
+
+    class WordPressCommentList(CommentList):
+
+        def __init__(self, blog_post_id, meta_data_dict=None, headers=None,
+                     post_body='content', vim_vars=None, client=None,
+                     comment_categories=None):
+            if meta_data_dict is None:
+                meta_data_dict = {'Status': 'status', 'Author': 'author',
+                                  'ID': 'comment_id', 'Parent': 'parent',
+                                  'Date_AS_DateTime': 'date_created_gmt',
+                                  'Type': 'type', 'content': 'content',
+                                 }
+            super(BlogIt.WordPressCommentList, self).__init__(
+                    meta_data_dict, headers, post_body, comment_categories)
+            if vim_vars is None:
+                vim_vars = BlogIt.VimVars()
+            self.vim_vars = vim_vars
+            if client is None:
+                client = BlogIt.server_proxy(self.vim_vars)
+            self.client = client
+            self.BLOG_POST_ID = blog_post_id
+
+        def send(self, lines):
+            """ Send changed and new comments to server.
+
+            >>> c = BlogIt.WordPressCommentList(42)
+            >>> mock('sys.stderr')
+            >>> mock('c.getComments')
+            >>> mock('c.changed_comments',
+            ...         returns=[ BlogIt.Comment(post_data, c.meta_data_dict)
+            ...             for post_data in
+            ...                 { 'status': 'new', 'content': 'New Text' },
+            ...                 { 'status': 'will fail', 'comment_id': 13 },
+            ...                 { 'status': 'will succeed', 'comment_id': 7 },
+            ...                 { 'status': 'rm', 'comment_id': 100 } ])
+            >>> mock('xmlrpclib.MultiCall', returns=Mock(
+            ...         'multicall', returns=[ 200, False, True, True ]))
+            >>> c.send(None)    #doctest: +NORMALIZE_WHITESPACE
+            Called xmlrpclib.MultiCall(<ServerProxy for example.com/RPC2>)
+            Called c.changed_comments(None)
+            Called multicall.wp.newComment( '', 'user', 'password', 42,
+                {'status': 'approve', 'content': 'New Text'})
+            Called multicall.wp.editComment( '', 'user', 'password', 13,
+                {'status': 'will fail', 'comment_id': 13})
+            Called multicall.wp.editComment( '', 'user', 'password', 7,
+                 {'status': 'will succeed', 'comment_id': 7})
+            Called multicall.wp.deleteComment('', 'user', 'password', 100)
+            Called multicall()
+            Called sys.stderr.write('Server refuses update to 13.')
+            Called c.getComments()
+
+            >>> vim.current.buffer.change_buffer()
+            >>> minimock.restore()
+
+            """
+            multicall = xmlrpclib.MultiCall(self.client)
+            username, password = (self.vim_vars.blog_username,
+                                  self.vim_vars.blog_password)
+            multicall_log = []
+            for comment in self.changed_comments(lines):
+                if comment.get_server_var__Status() == 'new':
+                    comment.set_server_var__Status('approve')
+                    comment.post_data.update(comment.new_post_data)
+                    multicall.wp.newComment('', username, password,
+                                            self.BLOG_POST_ID,
+                                            comment.post_data)
+                    multicall_log.append('new')
+                elif comment.get_server_var__Status() == 'rm':
+                    multicall.wp.deleteComment('', username, password,
+                                               comment.get_server_var__ID())
+                else:
+                    comment_id = comment.get_server_var__ID()
+                    multicall.wp.editComment('', username, password,
+                                             comment_id, comment.post_data)
+                    multicall_log.append(comment_id)
+            for accepted, comment_id in zip(multicall(), multicall_log):
+                if comment_id != 'new' and not accepted:
+                    sys.stderr.write('Server refuses update to %s.' %
+                                     comment_id)
+            return self.getComments()
+
+        def _no_send(self, lines=[], push=None):
+            """ Replace send() with this to prevent the user from commiting.
+            """
+            raise BlogIt.NoPostException
+
+        def getComments(self, offset=0):
+            """ Lists the comments to a post with given id in a new buffer.
+
+            >>> mock('xmlrpclib.MultiCall', returns=Mock(
+            ...         'multicall', returns=[], tracker=None))
+            >>> c = BlogIt.WordPressCommentList(42)
+            >>> mock('c.display', returns=[])
+            >>> mock('c.changed_comments', returns=[])
+            >>> c.getComments()   #doctest: +NORMALIZE_WHITESPACE
+            Called xmlrpclib.MultiCall(<ServerProxy for example.com/RPC2>)
+            Called c.display()
+            Called c.changed_comments([])
+
+            >>> minimock.restore()
+            """
+            multicall = xmlrpclib.MultiCall(self.client)
+            for comment_typ in ('hold', 'spam', 'approve'):
+                multicall.wp.getComments('', self.vim_vars.blog_username,
+                        self.vim_vars.blog_password,
+                        {'post_id': self.BLOG_POST_ID, 'status': comment_typ,
+                         'offset': offset, 'number': 1000})
+            self.empty_comment_list()
+            for comments, heading in zip(multicall(),
+                    ('In Moderadation', 'Spam', 'Published')):
+                for comment_dict in comments:
+                    self.add_comment(heading, comment_dict)
+            if len(self.comment_list) <= self.vim_vars.blog_lazy_comments:
+                self.expanded = None
+            elif self.expanded is None:
+                self.expanded = set()
+                self.init_collapsed_threads()
+            if list(self.changed_comments(self.display())) != []:
+                msg = 'Bug in BlogIt: Deactivating comment editing:\n'
+                for d in self.changed_comments(self.display()):
+                    msg += "  '%s'" % d['comment_id']
+                    msg += str(list(self.changed_comments(self.display())))
+                self.send = self._no_send
+                raise BlogIt.BlogItBug(msg)
+
+
+    class PreviewPage(object):
+        """ The rendered post shared with the threads of the PreviewServer.
+
+        >>> page = BlogIt.PreviewPage()
+        >>> page.update('Title', '<p>Text</p>')
+        >>> page.wait(0, timeout=0)
+        1
+        """
+
+        def __init__(self):
+            self.version = 0
+            self.title = ''
+            self.body = ''
+            self.clients = 0
+            self.changed = threading.Condition()
+
+        def update(self, title, body):
+            self.changed.acquire()
+            try:
+                self.title, self.body = title, body
+                self.version += 1
+                self.changed.notifyAll()
+            finally:
+                self.changed.release()
+
+        def wait(self, version, timeout=None):
+            """ Returns the version once it differs from version. """
+            self.changed.acquire()
+            try:
+                if self.version == version:
+                    self.changed.wait(timeout)
+                return self.version
+            finally:
+                self.changed.release()
+
+        def as_json(self):
+            self.changed.acquire()
+            try:
+                return json.dumps({'version': self.version,
+                                   'title': self.title, 'body': self.body})
+            finally:
+                self.changed.release()
+
+
+    class Preview(object):
+        r""" Renders the buffer of a post into a PreviewPage.
+
+        Only sections (split by <!--more-->) whose text changed are filtered
+        again.
+
+        >>> mock('BlogIt.BlogPost.format', returns_func=lambda lines:
+        ...         '<p>%s</p>' % '\n'.join(lines))
+        >>> preview = BlogIt.Preview(BlogIt.BlogPost(42))
+        >>> preview.update(['Subject: A title', '', 'one', '',
+        ...                 '<!--more-->', '', 'two'])
+        Called BlogIt.BlogPost.format(('one', ''))
+        Called BlogIt.BlogPost.format(('two',))
+        True
+        >>> preview.page.title, preview.page.body
+        ('A title', '<p>one\n</p>\n<!--more-->\n<p>two</p>')
+        >>> preview.update(['Subject: A title', '', 'one', '',
+        ...                 '<!--more-->', '', 'two'])
+        False
+        >>> preview.update(['Subject: A title', '', 'one', '',
+        ...                 '<!--more-->', '', 'three'])
+        Called BlogIt.BlogPost.format(('three',))
+        True
+        >>> minimock.restore()
+        """
+
+        def __init__(self, post):
+            self.post = post
+            self.page = BlogIt.PreviewPage()
+            self.digest = None
+            self.sections = {}
+
+        def update(self, lines):
+            """ Renders lines unless they are unchanged. Returns if so. """
+            digest = hashlib.sha1('\n'.join(lines)).hexdigest()
+            if digest == self.digest:
+                return False
+            self.digest = digest
+            title, body = '', []
+            for i, line in enumerate(lines):
+                if line.strip() == '':
+                    body = lines[i + 1:]
+                    break
+                if line.startswith('Subject: '):
+                    title = line[len('Subject: '):].strip()
+            sections, html = {}, []
+            for section in self.post.split_more(body):
+                section = tuple(section)
+                try:
+                    sections[section] = self.sections[section]
+                except KeyError:
+                    try:
+                        sections[section] = self.post.format(section)
+                    except BlogIt.FilterException, e:
+                        sections[section] = '<pre>%s</pre>' % cgi.escape(
+                                e.message)
+                html.append(sections[section])
+            self.sections = sections
+            self.page.update(title, '\n<!--more-->\n'.join(html))
+            return True
+
+
+    class PreviewRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+        """ Serves /{bufnr}, its /{bufnr}/body and /{bufnr}/events. """
+        PAGE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>%(title)s</title></head>
+<body><h1 id="blogit-title">%(title)s</h1>
+<div id="blogit-body">%(body)s</div>
+<script>
+var events = new EventSource('/%(bufnr)d/events?since=%(version)d');
+events.onmessage = function () {
+    var request = new XMLHttpRequest();
+    request.open('GET', '/%(bufnr)d/body');
+    request.onload = function () {
+        var page = JSON.parse(request.responseText);
+        document.title = page.title;
+        document.getElementById('blogit-title').textContent = page.title;
+        document.getElementById('blogit-body').innerHTML = page.body;
+    };
+    request.send();
+};
+</script></body></html>
+'''
+        KEEPALIVE = 15    # seconds
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            m = re.match(r'^/(\d+)(/body|/events)?(?:\?since=(\d+))?$',
+                         self.path)
+            try:
+                page = self.server.pages[int(m.group(1))]
+            except (AttributeError, KeyError):
+                self.send_error(404)
+                return
+            if m.group(2) is None:
+                page.changed.acquire()
+                try:
+                    html = self.PAGE % {'bufnr': int(m.group(1)),
+                            'title': cgi.escape(page.title),
+                            'body': page.body, 'version': page.version}
+                finally:
+                    page.changed.release()
+                self.send_content('text/html; charset=utf-8', html)
+            elif m.group(2) == '/body':
+                self.send_content('application/json', page.as_json())
+            else:
+                self.send_events(page, int(m.group(3) or 0))
+
+        def send_content(self, content_type, content):
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(content)))
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(content)
+
+        def send_events(self, page, version):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            page.clients += 1
+            try:
+                while not self.server.closed:
+                    new_version = page.wait(version, self.KEEPALIVE)
+                    if new_version == version:
+                        self.wfile.write(': keepalive\n\n')
+                    else:
+                        version = new_version
+                        self.wfile.write('data: %d\n\n' % version)
+                    self.wfile.flush()
+            except IOError:    # The browser went away.
+                pass
+            finally:
+                page.clients -= 1
+
+
+    class PreviewServer(SocketServer.ThreadingMixIn,
+                        BaseHTTPServer.HTTPServer):
+        """ Local http server pushing updates of the previews to browsers.
+        """
+        daemon_threads = True
+
+        def __init__(self, address=('127.0.0.1', 0)):
+            BaseHTTPServer.HTTPServer.__init__(self, address,
+                                               BlogIt.PreviewRequestHandler)
+            self.pages = {}
+            self.closed = False
+
+        def start(self):
+            thread = threading.Thread(target=self.serve_forever)
+            thread.daemon = True
+            thread.start()
+
+        def stop(self):
+            self.closed = True
+            self.shutdown()
+            self.server_close()
+
+        def url(self, bufnr):
+            return 'http://%s:%s/%d' % (self.server_address + (bufnr,))
+
+
+    class HeadlessVim(object):
+        """ Stands in for the vim module outside of vim.
+
+        Variables are read from the let commands of a vim script such as
+        passwords.vim. Any other expression evaluates to 0 and commands are
+        ignored.
+
+        >>> headless = BlogIt.HeadlessVim()
+        >>> headless.read_lets(['let blogit_url = "http://example.com/"',
+        ...                     "  let g:blogit_username='it''s me'",
+        ...                     'let blogit_compress=0  " no gzip'])
+        >>> headless.eval("exists('blogit_username')"), headless.eval(
+        ...         'blogit_username')
+        ('1', "it's me")
+        >>> headless.eval("exists('blogit_password')")
+        '0'
+        >>> headless.eval('blogit_compress'), headless.eval('1 + 1')
+        ('0', '0')
+        """
+        LET = re.compile(r'''^\s*let\s+(?:g:)?(\w+)\s*=\s*('(?:[^']|'')*'|'''
+                         r'''"(?:[^"\\]|\\.)*"|-?\d+)''')
+        EXISTS = re.compile(r'''^exists\(['"](?:g:)?(\w+)['"]\)$''')
+
+        def __init__(self, variables=None):
+            self.variables = dict(variables or {})
+
+        def read_lets(self, lines):
+            for line in lines:
+                m = self.LET.match(line)
+                if m is None:
+                    continue
+                name, value = m.groups()
+                if value.startswith("'"):
+                    value = value[1:-1].replace("''", "'")
+                elif value.startswith('"'):
+                    value = value[1:-1].decode('string_escape')
+                self.variables[name] = value
+
+        def eval(self, expression):
+            m = self.EXISTS.match(expression)
+            if m is not None:
+                return m.group(1) in self.variables and '1' or '0'
+            return self.variables.get(expression.replace('g:', '', 1), '0')
+
+        def command(self, command):
+            pass
+
+
+    class RateLimiter(object):
+        """ Lets threads start at most rate actions per second (0: any). """
+
+        def __init__(self, rate=0):
+            self.interval = rate and 1.0 / rate
+            self.next = 0
+            self._lock = threading.Lock()
+
+        def wait(self):
+            if not self.interval:
+                return
+            self._lock.acquire()
+            try:
+                now = time()
+                start = max(now, self.next)
+                self.next = start + self.interval
+            finally:
+                self._lock.release()
+            sleep(start - now)
+
+
+    class BatchPost(WordPressBlogPost):
+        """ A post sent by the BatchPublisher: failures are raised.
+
+        on_created is called with the id of a new post before anything else
+        can fail.
+        """
+        on_created = None
+
+        def send_failed(self, fault):
+            raise fault
+
+        def created(self):
+            if self.on_created is not None:
+                self.on_created(self.BLOG_POST_ID)
+
+
+    class BatchPublisher(object):
+        """ Creates or updates a post for each of many files, in parallel.
+
+        Files are in the format of a post buffer (headers, an empty line and
+        the body) or plain text, whose title is its first line if that is
+        a "# " heading or else the file name.
+
+        What was sent is appended to a log (one json object per line, by
+        absolute path), so an interrupted run is resumed by starting it again:
+        files unchanged since they were sent are skipped, changed files update
+        their post. So do files sent with another push (see
+        WordPressBlogPost.do_send). The id of a new post is logged as soon as
+        the server returns it, so a file whose post was created is never
+        created again.
+        """
+        HEADER = re.compile(r'^(From|Id|Subject|Status|Categories|Tags|'
+                            r'Date): ')
+
+        def __init__(self, vim_vars, log_path, push=1, jobs=4, rate=0,
+                     out=sys.stdout):
+            self.vim_vars = vim_vars
+            self.log_path = log_path
+            self.push = push
+            self.jobs = jobs
+            self.limiter = BlogIt.RateLimiter(rate)
+            # Shared by the workers, so each image is only uploaded once.
+            self.media_index = BlogIt.MediaIndex(vim_vars.blog_media_index)
+            self.out = out
+            self.log = self.read_log(log_path)
+            self.counts = dict.fromkeys(('created', 'updated', 'unchanged',
+                                         'failed'), 0)
+            self._lock = threading.Lock()
+
+        @staticmethod
+        def read_log(path):
+            """ Returns {path: entry} of the entries logged last. """
+            log = {}
+            try:
+                f = open(path)
+            except IOError:
+                return log
+            try:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue    # Cut short when the last run stopped.
+                    log[os.path.abspath(entry['path'])] = entry
+            finally:
+                f.close()
+            return log
+
+        def lines(self, path, text):
+            """ Returns the lines of a post buffer for the file. """
+            lines = text.splitlines()
+            if lines and self.HEADER.match(lines[0]):
+                return lines
+            if lines and lines[0].startswith('# '):
+                title, lines = lines[0][2:].strip(), lines[1:]
+            else:
+                title = os.path.splitext(os.path.basename(path))[0]
+            return ['Subject: ' + title, ''] + lines
+
+        def publish_file(self, path):
+            f = open(path)
+            try:
+                text = f.read()
+            finally:
+                f.close()
+            sha1 = hashlib.sha1(text).hexdigest()
+            key = os.path.abspath(path)
+            entry = self.log.get(key)
+            if (entry is not None and entry.get('sha1') == sha1 and
+                    entry.get('push', self.push) == self.push):
+                return 'unchanged', entry['id']
+            lines = self.lines(path, text)
+            post_id = entry and entry['id']
+            for line in lines:
+                if line.strip() == '':
+                    break
+                if line.startswith('Id: ') and line[4:].strip():
+                    post_id = line[4:].strip()
+            self.limiter.wait()
+            if post_id:
+                post = BlogIt.BatchPost(post_id, vim_vars=self.vim_vars)
+                post.getPost()
+            else:
+                post = BlogIt.BatchPost.blank(self.vim_vars)
+                post.on_created = lambda post_id: self.record(
+                        {'path': key, 'id': str(post_id), 'time': time()})
+            lines = post.upload_media(lines, os.path.dirname(path),
+                                      self.media_index)
+            post.send(lines, self.push)
+            self.record({'path': key, 'sha1': sha1, 'push': self.push,
+                         'id': str(post.BLOG_POST_ID), 'time': time()})
+            return post_id and 'updated' or 'created', post.BLOG_POST_ID
+
+        def record(self, entry):
+            self._lock.acquire()
+            try:
+                f = open(self.log_path, 'a')
+                try:
+                    f.write(json.dumps(entry) + '\n')
+                finally:
+                    f.close()
+                self.log[entry['path']] = entry
+            finally:
+                self._lock.release()
+
+        def report(self, status, post_id, path, error=None):
+            self._lock.acquire()
+            try:
+                self.counts[status] += 1
+                if error is None:
+                    self.out.write('%-9s %8s  %s\n' % (status, post_id, path))
+                else:
+                    self.out.write('%-9s %8s  %s: %s\n' % (status, '', path,
+                                                           error))
+                self.out.flush()
+            finally:
+                self._lock.release()
+
+        def publish(self, paths):
+            """ Sends the files in paths, returns the number of failures. """
+
+            def publish_file(path):
+                try:
+                    status, post_id = self.publish_file(path)
+                except Exception, e:
+                    self.report('failed', None, path, getattr(e, 'faultString',
+                                                              None) or e)
+                else:
+                    self.report(status, post_id, path)
+            start = time()
+            try:
+                BlogIt.parallel_map(publish_file, paths, self.jobs)
+            finally:
+                self.summary(time() - start)
+            return self.counts['failed']
+
+        def summary(self, seconds):
+            sent = self.counts['created'] + self.counts['updated']
+            stats = BlogIt.CompressedTransport.stats
+            self.out.write('\n%(created)d created, %(updated)d updated, '
+                           '%(unchanged)d unchanged, %(failed)d failed\n' %
+                           self.counts)
+            self.out.write('%d posts in %.1f s: %.2f posts/s, %d kB sent, '
+                           '%d kB received\n' %
+                           (sent, seconds, sent / max(seconds, 0.001),
+                            stats['sent'] / 1024, stats['received'] / 1024))
+
+
+    class PostRegistry(object):
+        """ Maps buffer numbers to the posts shown in them.
+
+        The data of posts in hidden buffers is written to a temporary
+        directory, least recently used first, while it takes more than
+        limit bytes. It is read back when the post is looked up again.
+
+        >>> registry = BlogIt.PostRegistry()
+        >>> registry[3] = BlogIt.BlogPost(42, {'description': 'x' * 1000})
+        >>> registry[4] = BlogIt.BlogPost(43, {'description': 'y' * 1000})
+        >>> registry.hide(visible=[4], limit=500)
+        >>> registry.spilled.keys(), registry.posts[3].post_data
+        ([3], None)
+        >>> len(registry[3].post_data['description']), registry.spilled
+        (1000, {})
+        >>> registry.discard(3); 3 in registry
+        False
+        """
+
+        def __init__(self):
+            self.posts = collections.OrderedDict()    # Least recently used first.
+            self.sizes = {}      # bufnr: bytes of the data, until looked up
+            self.spilled = {}    # bufnr: (path, bytes)
+            self.directory = None
+
+        def __contains__(self, bufnr):
+            return bufnr in self.posts
+
+        def __getitem__(self, bufnr):
+            post = self.posts.pop(bufnr)
+            self.posts[bufnr] = post
+            self.sizes.pop(bufnr, None)    # It may change now.
+            if bufnr in self.spilled:
+                path, size = self.spilled.pop(bufnr)
+                f = open(path, 'rb')
+                try:
+                    post.unspill(cPickle.loads(zlib.decompress(f.read())))
+                finally:
+                    f.close()
+                os.remove(path)
+            return post
+
+        def __setitem__(self, bufnr, post):
+            self.discard(bufnr)
+            self.posts[bufnr] = post
+
+        def discard(self, bufnr):
+            """ Forgets the post of a buffer (if any). """
+            self.posts.pop(bufnr, None)
+            self.sizes.pop(bufnr, None)
+            if bufnr in self.spilled:
+                os.remove(self.spilled.pop(bufnr)[0])
+
+        def size(self, bufnr):
+            """ Bytes of the data of a post (None if it can't be stored). """
+            if bufnr in self.spilled:
+                return self.spilled[bufnr][1]
+            if bufnr not in self.sizes:
+                state = self.posts[bufnr].spill_state()
+                try:
+                    self.sizes[bufnr] = len(cPickle.dumps(
+                            state, cPickle.HIGHEST_PROTOCOL))
+                except (cPickle.PicklingError, TypeError):
+                    self.sizes[bufnr] = None
+            return self.sizes[bufnr]
+
+        def hide(self, visible, limit):
+            """ Spills hidden posts while they take more than limit bytes. """
+            hidden = [n for n in self.posts
+                      if n not in visible and n not in self.spilled]
+            hidden = [n for n in hidden if self.size(n) is not None]
+            used = sum(self.sizes[n] for n in hidden)
+            for bufnr in hidden:
+                if used <= limit:
+                    break
+                used -= self.sizes.pop(bufnr)
+                self.spill(bufnr)
+
+        def spill(self, bufnr):
+            if self.directory is None:
+                self.directory = tempfile.mkdtemp(prefix='blogit-')
+                atexit.register(shutil.rmtree, self.directory, True)
+            post = self.posts[bufnr]
+            state = post.spill()
+            path = os.path.join(self.directory, '%d.pickle' % bufnr)
+            try:
+                data = zlib.compress(cPickle.dumps(state,
+                                                   cPickle.HIGHEST_PROTOCOL), 1)
+                f = open(path, 'wb')
+                try:
+                    f.write(data)
+                finally:
+                    f.close()
+            except:
+                post.unspill(state)
+                raise
+            self.spilled[bufnr] = (path, len(data))
+
+
+    def __init__(self):
+        self._posts = BlogIt.PostRegistry()
+        self.preview_server = None
+        self.previews = {}
+        self.prefetcher = BlogIt.Prefetcher()
+        self.NO_POST = BlogIt.NoPost()
+
+    def _get_current_post(self):
+        try:
+            return self._posts[vim.current.buffer.number]
+        except KeyError:
+            return self.NO_POST
+
+    def _set_current_post(self, post):
+        """
+        >>> vim.current.buffer.change_buffer(3)
+        >>> blogit.current_post = Mock('post@buffer_3_', tracker=None)
+        >>> vim.current.buffer.change_buffer(7)
+        >>> blogit.current_post    #doctest: +ELLIPSIS
+        <testing.blogit.NoPost object at 0x...>
+        >>> blogit.current_post = Mock('post@buffer_7_', tracker=None)
+        >>> vim.current.buffer.change_buffer(3)
+        >>> blogit.current_post    #doctest: +ELLIPSIS
+        <Mock 0x... post@buffer_3_>
+        >>> vim.current.buffer.change_buffer(42)
+        """
+        self._posts[vim.current.buffer.number] = post
+        post.vim_vars.export_blog_name()
+        post.vim_vars.export_post_type(post)
+        vim.command('augroup blogit_posts')
+        vim.command('autocmd! * <buffer>')
+        vim.command('autocmd BufWipeout,BufDelete <buffer> call ' +
+                    "blogit#command('!', 'forget_buffer', expand('<abuf>'))")
+        vim.command('autocmd BufHidden <buffer> call ' +
+                    "blogit#command('!', 'buffer_hidden', expand('<abuf>'))")
+        vim.command('augroup END')
+
+    current_post = property(_get_current_post, _set_current_post)
+
+    vimcommand_help = []
+
+    def command(self, bang='', command='help', *args):
+        """ Interface called by vim user-function ':Blogit'.
+
+        >>> mock('xmlrpclib')
+        >>> mock('sys.stderr')
+        >>> blogit.command('', 'non-existant')
+        Called sys.stderr.write('No such command: non-existant.')
+
+        >>> def f(x): print 'got %s' % x
+        >>> blogit.command_mocktest = f
+        >>> blogit.command('', 'mo')
+        Called sys.stderr.write('Command mo takes 0 arguments.')
+
+        >>> blogit.command('', 'mo', 2)
+        got 2
+
+        >>> blogit.command_mockambiguous = f
+        >>> blogit.command('', 'mo')    #doctest: +NORMALIZE_WHITESPACE
+        Called sys.stderr.write('Ambiguious command mo:
+                mockambiguous, mocktest.')
+
+        >>> mock('blogit.list_edit')
+        >>> blogit.command('!', 'list_edit')
+        Called blogit.list_edit()
+
+        >>> minimock.restore()
+        """
+        if bang == '!':
+            # Workaround limit to access vim s:variables when
+            # called via :python.
+            getattr(self, command)(*args)
+            return
+
+        def f(x):
+            return x.startswith('command_' + command)
+
+        matching_commands = filter(f, dir(self))
+
+        if len(matching_commands) == 0:
+            sys.stderr.write("No such command: %s." % command)
+        elif len(matching_commands) == 1:
+            try:
+                getattr(self, matching_commands[0])(*args)
+            except BlogIt.NoPostException:
+                sys.stderr.write('No Post in current buffer.')
+            except TypeError, e:
+                try:
+                    print e.read()
+                    sys.stderr.write("Command %s takes %s arguments." % \
+                            (command, int(str(e).split(' ')[3]) - 1))
+                except:
+                    sys.stderr.write('%s' % e)
+            except Exception, e:
+                sys.stderr.write(unicode(e))
+        else:
+            sys.stderr.write("Ambiguious command %s: %s." %
+                             (command,
+                              ', '.join([s.replace('command_', '', 1)
+                                                for s in matching_commands])))
+
+    def list_comments(self):
+        if vim.current.line.startswith('Status: '):
+            p = BlogIt.WordPressCommentList.create_from_post(self.current_post)
+            vim.command('enew')
+            self.current_post = p
+            try:
+                p.getComments()
+            except BlogIt.BlogItBug, e:
+                p.init_vim_buffer()
+                vim.command('setlocal nomodifiable')
+                sys.stderr.write(unicode(e))
+            else:
+                p.init_vim_buffer()
+
+    def comments_expand(self, all=''):
+        """ Loads the collapsed thread under the cursor (or all of them) into
+        the comment buffer.
+        """
+        comments = self.current_post
+        if getattr(comments, 'expanded', None) is None:
+            return
+        buffer = vim.current.buffer
+        row, col = vim.current.window.cursor
+        if all:
+            starts = range(len(buffer) - 1, -1, -1)
+        else:
+            # The marker line of the thread under the cursor.
+            starts = [row - 1]
+            while starts[0] > 0 and not buffer[starts[0]].startswith(60 * '='):
+                starts[0] -= 1
+        modified = vim.eval('&modified')
+        for start in starts:
+            if not (buffer[start].startswith(60 * '=') and
+                    comments.is_collapsed(buffer[start + 1:start + 2])):
+                continue
+            thread_id = buffer[start + 1].split()[1]
+            end = start + 1
+            while end < len(buffer) and not buffer[end].startswith(60 * '='):
+                end += 1
+            buffer[start:end] = [BlogIt.enc(line)
+                                 for line in comments.expand(thread_id)]
+        if modified == '0':
+            vim.command('setlocal nomodified')
+
+    def comments_expand_open(self):
+        """ Loads a collapsed thread whose fold was opened by other means than
+        the mapped fold commands (e.g. a search) once the cursor is in it.
+        """
+        if vim.eval("foldclosed('.')") == '-1':
+            self.comments_expand()
+
+    def forget_buffer(self, bufnr):
+        """ Drops everything kept for a deleted buffer. """
+        bufnr = int(bufnr)
+        self._posts.discard(bufnr)
+        if bufnr in self.previews:
+            del self.previews[bufnr]
+            del self.preview_server.pages[bufnr]
+
+    @staticmethod
+    def _visible_buffers():
+        return set(int(n) for buffers in vim.eval(
+                "map(range(1, tabpagenr('$')), 'tabpagebuflist(v:val)')")
+                   for n in buffers)
+
+    @staticmethod
+    def _memory_limit():
+        """ Bytes the data of hidden posts may take (let blogit_memory=...).
+        """
+        return int(vim.eval("get(g:, 'blogit_memory', %d)" % (32 * 2 ** 20)))
+
+    def buffer_hidden(self, bufnr):
+        """ Spills hidden posts taking more than blogit_memory bytes. """
+        visible = self._visible_buffers()
+        visible.discard(int(bufnr))
+        self._posts.hide(visible, self._memory_limit())
+
+    def list_edit(self):
+        row, col = vim.current.window.cursor
+        post = self.current_post.open_row(row)
+        self.prefetcher.getPost(post)
+        vim.command('bdelete')
+        vim.command('enew')
+        post.init_vim_buffer()
+        self.current_post = post
+
+    def list_prefetch(self):
+        """ Prefetches the posts around the cursor in the listing. """
+        listing = self.current_post
+        rows = listing.vim_vars.blog_prefetch
+        if rows == 0:
+            return
+        row, col = vim.current.window.cursor
+        posts = []
+        for n in sorted(range(max(2, row - rows), row + rows + 1),
+                        key=lambda n: abs(n - row)):
+            post = listing.open_row(n)
+            if post is not None and hasattr(post, 'fetcher'):
+                posts.append(post)
+        with_terms = vim.eval('s:used_tags == [] || '
+                              's:used_categories == []') == '1'
+        self.prefetcher.want(posts, with_terms)
+
+    @staticmethod
+    def str_to_DateTime(text='', format='%c'):
+        if text == '':
+            return DateTime('')
+        else:
+            try:
+                text = text.encode(getpreferredencoding())
+            except UnicodeDecodeError:
+                text = text.decode('utf-8').encode(getpreferredencoding())
+            text = strptime(text, format)
+        return DateTime(strftime('%Y%m%dT%H:%M:%S', text))
+
+    @staticmethod
+    def DateTime_to_str(date, output_format='%c', input_format='%Y%m%dT%H:%M:%S'):
+        try:
+            return unicode(strftime(output_format,
+                                    strptime(str(date), input_format)),
+                           getpreferredencoding(), 'ignore')
+        except ValueError, e:
+            print e
+            return ''
+
+    def register_vimcommand(f, doc_string, register_to=vimcommand_help):
+        r"""
+        >>> class C:
+        ...     def command_f(self):
+        ...         ' A method. '
+        ...         print "f should not be executed."
+        ...     def command_g(self, one, two):
+        ...         ' A method with arguments. '
+        ...         print "g should not be executed."
+        ...     def command_h(self, one, two=None):
+        ...         ' A method with an optional arguments. '
+        >>> L = []
+        >>> vim_cmd = lambda f, L: BlogIt.register_vimcommand(f, f.__doc__, L)
+        >>> vim_cmd(C.command_f, L)
+        <unbound method C.command_f>
+        >>> L
+        [':Blogit f                  A method. \n']
+
+        >>> vim_cmd(C.command_g, L)
+        <unbound method C.command_g>
+        >>> L     #doctest: +NORMALIZE_WHITESPACE
+        [':Blogit f                  A method. \n',
+         ':Blogit g {one} {two}      A method with arguments. \n']
+        >>> vim_cmd(C.command_h, L)
+        <unbound method C.command_h>
+        >>> L     #doctest: +NORMALIZE_WHITESPACE
+        [':Blogit f                  A method. \n',
+         ':Blogit g {one} {two}      A method with arguments. \n',
+         ':Blogit h {one} [two]      A method with an optional arguments. \n']
+
+        """
+
+        def getArguments(func, skip=0):
+            """
+            Get arguments of a function as a string.
+            skip is the number of skipped arguments.
+            """
+            skip += 1
+            args, varargs, varkw, defaults = getargspec(func)
+            cut = len(args)
+            if defaults:
+                cut -= len(defaults)
+            args = ["{%s}" % a for a in args[skip:cut]] + \
+                   ["[%s]" % a for a in args[cut:]]
+            if varargs:
+                args.append("[*%s]" % varargs)
+            if varkw:
+                args.append("[**%s]" % varkw)
+            return " ".join(args)
+
+        command = '%s %s' % (f.func_name.replace('command_', ':Blogit '),
+                             getArguments(f))
+        register_to.append('%-25s %s\n' % (command, doc_string))
+        return f
+
+    def vimcommand(doc_string, f=register_vimcommand):
+        return partial(f, doc_string=doc_string)
+
+    def get_vim_vars(self, blog_name=None):
+        if blog_name is not None:
+            return BlogIt.VimVars(blog_name)
+        else:
+            return self.current_post.vim_vars
+
+    @vimcommand(_("list all posts"))
+    def command_ls(self, blog=None):
+        vim_vars = self.get_vim_vars(blog)
+        vim.command('botright new')
+        self.prefetcher.clear()
+        try:
+            self.current_post = BlogIt.PostListing.create_new_post(vim_vars)
+        except BlogIt.PostListingEmptyException:
+            vim.command('bdelete')
+            sys.stderr.write("There are no posts.")
+
+    @vimcommand(_("create a new post"))
+    def command_new(self, blog=None):
+        vim_vars = self.get_vim_vars(blog)
+        vim.command('enew')
+        self.current_post = BlogIt.AbstractBlogClient(vim_vars).create_new_post()
+
+    @vimcommand(_("make this a blog post"))
+    def command_this(self, blog=None):
+        if self.current_post is self.NO_POST:
+            vim_vars = self.get_vim_vars(blog)
+            self.current_post = BlogIt.AbstractBlogClient(vim_vars).create_new_post(post_content=vim.current.buffer[:])
+        else:
+            sys.stderr.write("Already editing a post.")
+
+    @vimcommand(_("edit a post"))
+    def command_edit(self, id, blog=None):
+        vim_vars = self.get_vim_vars(blog)
+        try:
+            id = int(id)
+        except ValueError:
+            if id in ['this', 'new']:
+                self.command(id, blog)
+                return
+            sys.stderr.write(
+                    "'id' must be an integer value or 'this' or 'new'.")
+            return
+
+        post = BlogIt.WordPressBlogPost(id, vim_vars=vim_vars)
+        try:
+            post.getPost()
+        except Fault, e:
+            sys.stderr.write('Blogit Fault: ' + e.faultString)
+        else:
+            vim.command('enew')
+            post.init_vim_buffer()
+            self.current_post = post
+
+    @vimcommand(_("edit a page"))
+    def command_page(self, id, blog=None):
+        # copied from command_edit
+        vim_vars = self.get_vim_vars(blog)
+
+        if id == 'new':
+            vim.command('enew')
+            post = BlogIt.WordPressPage.create_new_post(vim_vars)
+        elif id == 'this':
+            if self.current_post is not self.NO_POST:
+                sys.stderr.write("Already editing a post.")
+                return
+            post = BlogIt.WordPressPage.create_new_post(vim_vars,
+                                                        vim.buffer[:])
+        else:
+            try:
+                id = int(id)
+            except ValueError:
+                sys.stderr.write("'id' must be an integer value or 'new'.")
+                return
+            post = BlogIt.WordPressPage(id, vim_vars=vim_vars)
+            try:
+                post.getPost()
+            except Fault, e:
+                sys.stderr.write('Blogit Fault: ' + e.faultString)
+                return
+            vim.command('enew')
+            post.init_vim_buffer()
+        self.current_post = post
+
+    def _upload_media(self, p):
+        lines = p.upload_media(vim.current.buffer[:],
+                               vim.eval("expand('%:p:h')"))
+        if lines != vim.current.buffer[:]:
+            vim.current.buffer[:] = lines
+        return lines
+
+    @vimcommand(_("upload local images and link to them"))
+    def command_images(self):
+        self._upload_media(self.current_post)
+
+    @vimcommand(_("save article"))
+    def command_commit(self):
+        p = self.current_post
+        p.send(self._upload_media(p))
+        p.refresh_vim_buffer()
+
+    @vimcommand(_("publish article"))
+    def command_push(self):
+        p = self.current_post
+        p.send(self._upload_media(p), push=1)
+        p.refresh_vim_buffer()
+
+    @vimcommand(_("unpublish article (save as draft)"))
+    def command_unpush(self):
+        p = self.current_post
+        p.send(self._upload_media(p), push=0)
+        p.refresh_vim_buffer()
+
+    @vimcommand(_("remove a post"))
+    def command_rm(self, id):
+        p = self.current_post
+        try:
+            id = int(id)
+        except ValueError:
+            sys.stderr.write("'id' must be an integer value.")
+            return
+
+        if p.BLOG_POST_ID == id:
+            self.current_post = self.NO_POST
+            vim.command('bdelete')
+        try:
+            p.client.metaWeblog.deletePost('', id, p.vim_vars.blog_username,
+                                              p.vim_vars.blog_password)
+        except Fault, e:
+            sys.stderr.write(e.faultString)
+            return
+        sys.stdout.write('Article removed')
+
+    @vimcommand(_("update and list tags and categories"))
+    def command_tags(self):
+        p = self.current_post
+        username, password = p.vim_vars.blog_username, p.vim_vars.blog_password
+        multicall = xmlrpclib.MultiCall(p.client)
+        multicall.wp.getCategories('', username, password)
+        multicall.wp.getTags('', username, password)
+        categories, tags = tuple(multicall())
+        tags = [BlogIt.enc(tag['name']) for tag in tags]
+        categories = [BlogIt.enc(cat['categoryName']) for cat in categories]
+        vim.command('let s:used_tags = %s' % BlogIt.to_vim_list(tags))
+        vim.command('let s:used_categories = %s' %
+                            BlogIt.to_vim_list(categories))
+        sys.stdout.write('\n \n \nCategories\n==========\n \n' +
+                         ', '.join(categories))
+        sys.stdout.write('\n \n \nTags\n====\n \n' + ', '.join(tags))
+
+    def preview_update(self, bufnr=None):
+        """ Re-renders the preview of the post in buffer bufnr. """
+        if bufnr is None:
+            bufnr = vim.current.buffer.number
+        try:
+            preview = self.previews[int(bufnr)]
+        except KeyError:
+            return
+        preview.update(vim.buffers[int(bufnr)][:])
+
+    @vimcommand(_("preview article in browser"))
+    def command_preview(self):
+        p = self.current_post
+        if not isinstance(p, BlogIt.BlogPost):
+            raise BlogIt.NoPostException
+        if self.preview_server is None:
+            self.preview_server = BlogIt.PreviewServer()
+            self.preview_server.start()
+        bufnr = vim.current.buffer.number
+        preview = self.previews.get(bufnr)
+        if preview is not None and preview.post is not p:
+            del self.previews[bufnr]
+        if bufnr not in self.previews:
+            self.previews[bufnr] = BlogIt.Preview(p)
+            self.preview_server.pages[bufnr] = self.previews[bufnr].page
+            vim.command('augroup blogit_preview')
+            vim.command('autocmd! * <buffer>')
+            if vim.eval("has('timers')") == '1':
+                vim.command('autocmd TextChanged,TextChangedI <buffer> ' +
+                            'call blogit#preview_changed()')
+            else:
+                vim.command('autocmd CursorHold,CursorHoldI <buffer> ' +
+                            'Blogit! preview_update')
+            vim.command('augroup END')
+        preview = self.previews[bufnr]
+        preview.update(vim.current.buffer[:])
+        if preview.page.clients == 0:
+            webbrowser.open(self.preview_server.url(bufnr))
+
+    @vimcommand(_("show the bytes sent to and received from blogs"))
+    def command_traffic(self):
+        stats = BlogIt.CompressedTransport.stats
+        for direction in ('sent', 'received'):
+            sys.stdout.write('%-8s  %10d bytes on wire  %10d uncompressed\n' %
+                             (direction.capitalize(), stats[direction],
+                              stats[direction + '_raw']))
+
+    @vimcommand(_("show the memory used by the posts of the buffers"))
+    def command_memory(self):
+        visible = self._visible_buffers()
+        sys.stdout.write('Buffer  Type      State        Bytes\n')
+        total = {}
+        for bufnr, post in self._posts.posts.items():
+            size = self._posts.size(bufnr) or 0
+            if bufnr in self._posts.spilled:
+                state = 'on disk'
+            elif bufnr in visible:
+                state = 'visible'
+            else:
+                state = 'hidden'
+            total[state] = total.get(state, 0) + size
+            sys.stdout.write('%6d  %-8s  %-7s  %10d\n' %
+                             (bufnr, getattr(post, 'POST_TYPE', '?'), state,
+                              size))
+        for state in ('visible', 'hidden', 'on disk'):
+            sys.stdout.write('%-7s %26d\n' % (state.capitalize(),
+                                                total.get(state, 0)))
+        sys.stdout.write('Hidden posts are written to disk beyond %d bytes.\n'
+                         % self._memory_limit())
+
+    @vimcommand(_("display this notice"))
+    def command_help(self):
+        sys.stdout.write("Available commands:\n")
+        for f in self.vimcommand_help:
+            sys.stdout.write('   ' + f)
+
+    # needed for testing. Prevents beeing used as a decorator if it isn't at
+    # the end.
+    register_vimcommand = staticmethod(register_vimcommand)
+
+
+xmlrpclib.Marshaller.dispatch[BlogIt.MediaFile] = \
+        lambda marshaller, media, write: media.encode(write)
+BlogIt.StreamingMarshaller.dispatch[BlogIt.MediaFile] = \
+        lambda marshaller, media, write: write(media)
+
+blogit = BlogIt()
+
+
+def main(argv):
+    """ Publishes files without vim, e.g.:
+
+        python autoload/blogit.vim push posts/ --blog myblog --jobs 8
+    """
+    global vim
+    parser = argparse.ArgumentParser(prog='blogit',
+            description='Create or update a blog post for each file.')
+    parser.add_argument('command', choices=['push', 'commit', 'unpush'],
+                        help='publish the posts, save them (keeping the '
+                             'status of existing posts) or save them as '
+                             'drafts')
+    parser.add_argument('paths', nargs='+', metavar='path',
+                        help='a file or a directory searched for files')
+    parser.add_argument('--blog', default='blogit',
+                        help='blog_name of the blog (default: %(default)s)')
+    parser.add_argument('--config', default='~/.vim/passwords.vim',
+                        help='vim script with the let commands configuring '
+                             'the blog (default: %(default)s)')
+    parser.add_argument('--set', action='append', default=[],
+                        metavar='VAR=VALUE',
+                        help='set a variable, e.g. blogit_url=http://...')
+    parser.add_argument('--pattern', default='*.md',
+                        help='files searched in directories '
+                             '(default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=4,
+                        help='posts sent in parallel (default: %(default)s)')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='posts started per second at most')
+    parser.add_argument('--log', default='blogit-push.log',
+                        help='progress log, to resume an interrupted run '
+                             '(default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    vim = BlogIt.HeadlessVim()
+    try:
+        f = open(os.path.expanduser(args.config))
+    except IOError:
+        pass
+    else:
+        try:
+            vim.read_lets(f)
+        finally:
+            f.close()
+    for assignment in args.set:
+        name, value = assignment.split('=', 1)
+        vim.variables[name] = value
+
+    paths = []
+    for path in args.paths:
+        if not os.path.isdir(path):
+            paths.append(path)
+            continue
+        for directory, dirs, files in os.walk(path):
+            dirs.sort()
+            paths.extend(os.path.join(directory, name) for name in
+                         sorted(fnmatch.filter(files, args.pattern)))
+    publisher = BlogIt.BatchPublisher(BlogIt.VimVars(args.blog), args.log,
+                                      {'push': 1, 'commit': None,
+                                       'unpush': 0}[args.command],
+                                      max(1, args.jobs), args.rate)
+    try:
+        return publisher.publish(paths) and 1 or 0
+    except KeyboardInterrupt:
+        sys.stderr.write('Interrupted, run again to resume.\n')
+        return 130
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
+
+if doctest is not None:
+    doctest.testmod()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (C) 2009 Romain Bignon
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+
+""" Measures what blogit.vim adds to the startup time of Vim.
+
+Every Vim start used to source the whole plugin including its python block
+(imports, class definitions and BlogIt()). Now plugin/blogit.vim only defines
+:Blogit and autoload/blogit.vim is sourced on its first use. "eager" is the
+cost of loading both at startup, as before, "lazy" the cost of the stub.
+
+The python block is timed with the python running this script, so Vim
+doesn't need +python. Usage::
+
+    python bench_startup.py [runs]
+"""
+
+import os
+import sys
+import tempfile
+from subprocess import Popen, PIPE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN = os.path.join(ROOT, 'plugin', 'blogit.vim')
+AUTOLOAD = os.path.join(ROOT, 'autoload', 'blogit.vim')
+
+TIME_PYTHON_BLOCK = r'''
+import imp, sys, time
+sys.modules['vim'] = imp.new_module('vim')
+code = open(%r).read()
+code = code[code.index('python <<EOF\n') + 13:]
+start = time.time()
+exec compile(code, 'blogit', 'exec') in {'__name__': 'blogit'}
+print time.time() - start
+'''
+
+
+def vim_source_time(*scripts):
+    """ Seconds Vim needs to source scripts (without +python parts). """
+    out = tempfile.NamedTemporaryFile()
+    source = ' | '.join('silent! source %s' % s for s in scripts)
+    Popen(['vim', '-N', '-u', 'NONE', '-i', 'NONE', '-es',
+           '-c', 'let start = reltime() | %s | call writefile(' % source +
+                 '[string(reltimefloat(reltime(start)))], %r)' % out.name,
+           '-c', 'qa!'], stdout=PIPE, stderr=PIPE).communicate()
+    return float(open(out.name).read())
+
+
+def python_block_time():
+    """ Seconds a fresh python needs to run the python block. """
+    p = Popen([sys.executable, '-c', TIME_PYTHON_BLOCK % AUTOLOAD],
+              stdout=PIPE)
+    return float(p.communicate()[0])
+
+
+def median(L):
+    return sorted(L)[len(L) // 2]
+
+
+def main(runs=11):
+    eager_vim = median([vim_source_time(PLUGIN, AUTOLOAD)
+                        for i in range(runs)])
+    eager_python = median([python_block_time() for i in range(runs)])
+    lazy = median([vim_source_time(PLUGIN) for i in range(runs)])
+    print 'Startup cost of blogit.vim (median of %d runs):' % runs
+    print '  eager: %7.2f ms (vim script %.2f ms + python %.2f ms)' % (
+            1000 * (eager_vim + eager_python), 1000 * eager_vim,
+            1000 * eager_python)
+    print '  lazy:  %7.2f ms' % (1000 * lazy)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -1 +1 @@
-../plugin/blogit.vim
\ No newline at end of file
+../autoload/blogit.vim
\ No newline at end of file
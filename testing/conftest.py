@@ -75,6 +75,9 @@ def create_mocked_vim_vars(blog_url, username, password, blog_name):
     vim_vars.blog_password = password
     vim_vars.blog_name = blog_name
     vim_vars.blog_postsource = False
+    vim_vars.blog_compress = 1
+    vim_vars.blog_timeout = (10.0, 60.0)
+    vim_vars.blog_retries = 0
     return vim_vars
 
 
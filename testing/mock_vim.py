@@ -50,8 +50,9 @@ class MockVim(object):
 
     Use mock_vim() to create objects from MockVim.
 
-    vim.eval calls to blogit_(username|password|url|name) are so frequent
-    that we don't want to pollute doctest output with it.
+    vim.eval calls to blogit_(username|password|url|name|compress|timeout|
+    retries|lazy_comments) are so frequent that we don't want to pollute
+    doctest output with it.
 
     Holds the variables set as well as the buffers. mocked_eval is a hook
     for other calls to eval.
@@ -60,6 +61,10 @@ class MockVim(object):
                       'blogit_username': 'user',
                       'blogit_password': 'password',
                       'blogit_url': 'http://example.com',
+                      'blogit_compress': '1',
+                      'blogit_timeout': '10,60',
+                      'blogit_retries': '0',
+                      'blogit_lazy_comments': '200',
                      }
 
     def __init__(self, vim, vim_vars=None):
@@ -17,9 +17,15 @@
 
 
 from xmlrpclib import DateTime
+import os
+import threading
 import time
 
+from minimock import Mock
+
 from .blogit import BlogIt
+from . import blogit
+from .mock_vim import mock_vim
 
 
 def test_enc():
@@ -52,6 +58,16 @@ def test_vim_vars(vim_vars):
     assert n == 'blogit'
 
 
+def test_command_prefixes_stay_unique():
+    # Existing abbreviations, e.g. ":Blogit u" for unpush, must keep working.
+    commands = [c for c in dir(BlogIt) if c.startswith('command_')]
+    for prefix, command in (('c', 'commit'), ('u', 'unpush'),
+                            ('r', 'rm'), ('l', 'ls'), ('n', 'new'),
+                            ('e', 'edit'), ('h', 'help')):
+        assert [c for c in commands if c.startswith('command_' + prefix)
+               ] == ['command_' + command]
+
+
 def test_DateTime_to_str(monkeypatch):
     monkeypatch.setenv('TZ', 'EST+05EDT,M4.1.0,M10.5.0')
     time.tzset()
@@ -73,6 +89,166 @@ def test_str_to_DateTime(monkeypatch):
             == '20090628T17:38:58'
 
 
+def test_upload_media_skips_known_files(tmpdir, monkeypatch):
+    tmpdir.join('a.png').write('same image')
+    tmpdir.join('b.png').write('same image')
+    tmpdir.join('c.png').write('other image')
+    vim_vars = Mock('VimVars')
+    vim_vars.blog_upload_jobs = 2
+    vim_vars.blog_media_index = str(tmpdir.join('index.json'))
+    uploaded = []
+
+    def upload_file(self, media):
+        uploaded.append(media.path)
+        return 'http://example.com/%s' % len(uploaded)
+    monkeypatch.setattr(BlogIt.MediaUploader, 'upload_file', upload_file)
+    lines = ['![a](a.png)', '<img src="b.png">', '![c](c.png)']
+
+    uploader = BlogIt.MediaUploader(vim_vars, str(tmpdir))
+    new_lines = uploader.upload(lines)
+    assert len(uploaded) == 2
+    assert new_lines[0] == '![a](%s)' % new_lines[1][10:-2]
+    assert new_lines[1].startswith('<img src="http://example.com/')
+    assert new_lines[2].startswith('![c](http://example.com/')
+
+    uploader = BlogIt.MediaUploader(vim_vars, str(tmpdir))
+    assert uploader.upload(lines) == new_lines
+    assert len(uploaded) == 2
+
+
+def test_media_index_survives_corrupt_file(tmpdir):
+    path = tmpdir.join('index.json')
+    path.write('{"da39a3ee": "http://exa')    # Cut short by a crash.
+    index = BlogIt.MediaIndex(str(path))
+    assert index.get('da39a3ee') is None
+    index['da39a3ee'] = 'http://example.com/a.png'
+    index.save()
+    assert tmpdir.listdir() == [path]
+    assert BlogIt.MediaIndex(str(path)).get('da39a3ee') == \
+            'http://example.com/a.png'
+
+
+def test_filter_multi_megabyte_post(mocked_vim_vars):
+    # Larger than any pipe buffer: used to deadlock.
+    lines = ['Line %d of a long post.' % i for i in range(200000)]
+    assert sum(len(line) for line in lines) > 4 * 2 ** 20
+    mocked_vim_vars.a_blog_name_format = 'cat'
+    mocked_vim_vars.a_blog_name_unformat = 'tr a-z A-Z'
+    post = BlogIt.BlogPost('', vim_vars=mocked_vim_vars)
+    assert post.format(lines) == '\n'.join(lines)
+    assert post.unformat(lines) == [line.upper() for line in lines]
+
+
+def test_filter_streams_lines(mocked_vim_vars):
+    fed = []
+
+    def lines():
+        for i in range(200000):
+            fed.append(i)
+            yield 'Line %d of a long post.' % i
+    mocked_vim_vars.a_blog_name_format = 'cat'
+    post = BlogIt.BlogPost('', vim_vars=mocked_vim_vars)
+    output = post.filter(lines())
+    output.next()
+    # The output is read while the input is still being fed.
+    assert len(fed) < 100000
+    for chunk in output:
+        pass
+    assert len(fed) == 200000
+
+
+def test_pipe_closed_early():
+    lines = ('Line %d of a long post.\n' % i for i in xrange(400000))
+    output = BlogIt.pipe('cat', lines)
+    output.next()
+    closing = threading.Thread(target=output.close)
+    closing.daemon = True
+    closing.start()
+    closing.join(10)
+    assert not closing.is_alive()
+
+
+def test_lazy_comment_threads():
+    cl = BlogIt.WordPressCommentList(42, client=Mock('client'),
+                                     vim_vars=Mock('VimVars'))
+    cl.expanded = set()
+    for i in range(1000):
+        cl.add_comment('Published', {'comment_id': 'c%s' % i,
+                'parent': i % 10 and 'c%s' % (i - i % 10) or '0',
+                'status': 'approve', 'content': 'Comment %s' % i,
+                'author': 'Someone', 'type': '',
+                'date_created_gmt': DateTime('20090628T17:38:58')})
+    lines = list(cl.display())
+    assert len([l for l in lines if l.startswith('Thread: ')]) == 100
+    assert len(lines) < 500
+    assert list(cl.changed_comments(lines)) == []
+
+    start = lines.index('Thread: c990 (10 comments)') - 1
+    end = lines.index('Thread: c980 (10 comments)') - 1
+    lines[start:end] = cl.expand('c990')
+    assert list(cl.changed_comments(lines)) == []
+    assert lines == list(cl.display())
+    lines[lines.index('Comment 995')] = 'Changed'
+    assert [c.post_data['comment_id'] for c in cl.changed_comments(lines)
+           ] == ['c995']
+
+
+def test_comments_collapsed_after_commit(monkeypatch):
+    commands = []
+    vim = mock_vim(tracker=None)
+    vim.command = commands.append
+    monkeypatch.setattr(blogit, 'vim', vim)
+    comments = []
+    monkeypatch.setattr(blogit.xmlrpclib, 'MultiCall',
+                        lambda client: Mock('multicall', tracker=None,
+                                            returns=[[], [], comments]))
+    vim_vars = Mock('VimVars', tracker=None)
+    vim_vars.blog_lazy_comments = 5
+    cl = BlogIt.WordPressCommentList(42, client=Mock('client'),
+                                     vim_vars=vim_vars)
+    for i in range(10):
+        if i == 3:
+            cl.getComments()
+            assert cl.expanded is None and commands == []
+        comments.append({'comment_id': 'c%s' % i, 'parent': '0',
+                'status': 'approve', 'content': 'Comment %s' % i,
+                'author': 'Someone', 'type': '',
+                'date_created_gmt': DateTime('20090628T17:38:58')})
+    cl.getComments()
+    assert cl.expanded == set()
+    assert ("nnoremap <buffer> <silent> zo :<C-u>call blogit#command('!', "
+            "'comments_expand')<bar>execute 'normal! ' . v:count1 . 'zo'<cr>"
+            in commands)
+    assert ('autocmd CursorMoved <buffer> Blogit! comments_expand_open'
+            in commands)
+
+
+def test_registry_spills_hidden_posts():
+    registry = BlogIt.PostRegistry()
+    for bufnr in range(100):
+        post = BlogIt.BlogPost(bufnr, {'description': str(bufnr) * 100000})
+        registry[bufnr] = post
+    comments = BlogIt.CommentList()
+    for i in range(1000):
+        comments.add_comment('Published', {'ID': str(i), 'content': 'x' * 1000})
+    comment_lines = list(comments.display())
+    registry[100] = comments
+    registry.hide(visible=[0], limit=2 ** 19)
+    in_memory = [n for n in registry.posts if n not in registry.spilled]
+    assert sum(registry.size(n) for n in in_memory if n != 0) <= 2 ** 19
+    assert 0 in in_memory and 100 in registry.spilled
+    # Measuring a post leaves it as it is.
+    comment = registry[100].comment_list['5']
+    assert registry.size(100) > 10 ** 6
+    assert registry.posts[100].comment_list['5'] is comment
+    assert list(registry[100].display()) == comment_lines
+    assert registry[7].post_data['description'] == '7' * 100000
+    registry.discard(7)
+    assert 7 not in registry
+    assert sorted(os.listdir(registry.directory)) == sorted(
+            '%d.pickle' % n for n in registry.spilled)
+
+
 def pytest_funcarg__vim_vars(request):
     return BlogIt.VimVars()
 
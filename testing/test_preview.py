@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (C) 2009 Romain Bignon
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+
+
+import httplib
+import json
+import urllib2
+
+import py.test
+
+from .blogit import BlogIt
+from . import blogit
+from .mock_vim import mock_vim
+
+
+def pytest_funcarg__preview_server(request):
+    server = BlogIt.PreviewServer()
+    server.start()
+    request.addfinalizer(server.stop)
+    return server
+
+
+def test_serves_page(preview_server):
+    page = preview_server.pages[3] = BlogIt.PreviewPage()
+    page.update('A <title>', '<p>Text</p>')
+    html = urllib2.urlopen(preview_server.url(3), timeout=5).read()
+    assert '<title>A &lt;title&gt;</title>' in html
+    assert '<div id="blogit-body"><p>Text</p></div>' in html
+    body = json.loads(urllib2.urlopen(preview_server.url(3) + '/body',
+                                      timeout=5).read())
+    assert body == {'version': 1, 'title': 'A <title>',
+                    'body': '<p>Text</p>'}
+
+
+def test_unknown_page(preview_server):
+    py.test.raises(urllib2.HTTPError, urllib2.urlopen,
+                   preview_server.url(7), timeout=5)
+
+
+def test_pushes_updates(preview_server):
+    page = preview_server.pages[3] = BlogIt.PreviewPage()
+    page.update('Title', 'one')
+    connection = httplib.HTTPConnection(*preview_server.server_address,
+                                        timeout=5)
+    connection.request('GET', '/3/events?since=0')
+    # urllib2 would wait for more than a line.
+    events = connection.getresponse().fp
+    assert events.readline() == 'data: 1\n'
+    assert events.readline() == '\n'
+    page.update('Title', 'two')
+    assert events.readline() == 'data: 2\n'
+    assert page.clients == 1
+
+
+def test_command_preview(mocked_vim_vars, monkeypatch):
+    vim = mock_vim(tracker=None)
+    monkeypatch.setattr(blogit, 'vim', vim)
+    opened = []
+    monkeypatch.setattr(blogit.webbrowser, 'open', opened.append)
+    b = BlogIt()
+    post = BlogIt.BlogPost(42, vim_vars=mocked_vim_vars)
+    b._posts[vim.current.buffer.number] = post
+    vim.current.buffer[:] = ['Subject: A title', '', 'Text']
+    try:
+        b.command_preview()
+        preview = b.previews[vim.current.buffer.number]
+        assert preview.post is post
+        assert preview.page.title == 'A title'
+        assert opened == [b.preview_server.url(vim.current.buffer.number)]
+
+        # Another post in the same buffer gets a preview of its own.
+        other = BlogIt.BlogPost(43, vim_vars=mocked_vim_vars)
+        b._posts[vim.current.buffer.number] = other
+        b.command_preview()
+        assert b.previews[vim.current.buffer.number].post is other
+    finally:
+        b.preview_server.stop()
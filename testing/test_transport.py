@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (C) 2009 Romain Bignon
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+
+
+from StringIO import StringIO
+from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+from xmlrpclib import DateTime, Fault, ProtocolError
+import os
+import socket
+import threading
+import time
+
+import py
+
+from minimock import Mock
+
+from .blogit import BlogIt
+from . import blogit
+
+
+RECENT_POSTS = [{'postid': str(i), 'title': 'Post %s' % i,
+                 'date_created_gmt': DateTime('20090628T17:38:58'),
+                 'description': 10000 * 'x', 'categories': ['a']}
+                for i in range(20)]
+
+
+def get_posts(blog_id, username, password, filter, fields):
+    if 'post_content' in fields:
+        raise Fault(0, 'Post bodies requested')
+    return [{'post_id': p['postid'], 'post_title': p['title'],
+             'post_date_gmt': p['date_created_gmt']} for p in RECENT_POSTS]
+
+
+class FlakyRequestHandler(SimpleXMLRPCRequestHandler):
+    """ Answers 503 while the server has failures left. """
+
+    def do_POST(self):
+        if self.server.failures:
+            self.server.failures -= 1
+            self.rfile.read(int(self.headers['content-length']))
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            SimpleXMLRPCRequestHandler.do_POST(self)
+
+
+class WordPressServer(SimpleXMLRPCServer):
+    """ Faults on unknown methods like WordPress and logs the calls. """
+
+    def _dispatch(self, method, params):
+        self.calls.append(method)
+        if method not in self.funcs:
+            raise Fault(-32601, 'server error. requested method %s does '
+                                'not exist.' % method)
+        return SimpleXMLRPCServer._dispatch(self, method, params)
+
+
+def pytest_funcarg__xmlrpc_server(request):
+    server = WordPressServer(('127.0.0.1', 0), FlakyRequestHandler,
+                             logRequests=False)
+    server.failures = 0
+    server.calls = []
+    server.register_multicall_functions()
+    server.register_function(time.sleep, 'sleep')
+    server.register_function(lambda n: n * 'x', 'echo_size')
+    server.register_function(len, 'size')
+    server.register_function(lambda blog_id, username, password:
+                                 RECENT_POSTS, 'metaWeblog.getRecentPosts')
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    def shutdown():
+        server.shutdown()
+        server.server_close()
+    request.addfinalizer(shutdown)
+    return server
+
+
+def pytest_funcarg__xmlrpc_url(request):
+    server = request.getfuncargvalue('xmlrpc_server')
+    return 'http://%s:%s/RPC2' % server.server_address
+
+
+def pytest_funcarg__wordpress_client(request):
+    vim_vars = Mock('VimVars')
+    vim_vars.blog_clienttype = 'wordpress'
+    vim_vars.blog_url = request.getfuncargvalue('xmlrpc_url')
+    vim_vars.blog_username = 'user'
+    vim_vars.blog_password = 'password'
+    vim_vars.blog_compress = 1
+    vim_vars.blog_timeout = (10.0, 60.0)
+    vim_vars.blog_retries = 0
+    request.getfuncargvalue('monkeypatch').setattr(
+            BlogIt.WordPressBlogClient, 'without_wp_get_posts', set())
+    return BlogIt.AbstractBlogClient(vim_vars)
+
+
+def test_compressed_response(xmlrpc_url, monkeypatch):
+    monkeypatch.setattr(BlogIt.CompressedTransport, 'stats',
+                        dict.fromkeys(BlogIt.CompressedTransport.stats, 0))
+    proxy = BlogIt.CompressedTransport.server_proxy(xmlrpc_url)
+    assert proxy.echo_size(100000) == 100000 * 'x'
+    stats = BlogIt.CompressedTransport.stats
+    assert stats['received_raw'] > 100000
+    assert stats['received'] * 10 < stats['received_raw']
+    assert stats['sent'] == stats['sent_raw']
+
+
+def test_compressed_request(xmlrpc_url, monkeypatch):
+    monkeypatch.setattr(BlogIt.CompressedTransport, 'stats',
+                        dict.fromkeys(BlogIt.CompressedTransport.stats, 0))
+    proxy = BlogIt.CompressedTransport.server_proxy(xmlrpc_url, 1000)
+    assert proxy.size(100000 * 'x') == 100000
+    stats = BlogIt.CompressedTransport.stats
+    assert stats['sent'] * 10 < stats['sent_raw']
+
+
+def test_uncompressed(xmlrpc_url, monkeypatch):
+    monkeypatch.setattr(BlogIt.CompressedTransport, 'stats',
+                        dict.fromkeys(BlogIt.CompressedTransport.stats, 0))
+    proxy = BlogIt.CompressedTransport.server_proxy(xmlrpc_url, 0)
+    assert proxy.echo_size(100000) == 100000 * 'x'
+    stats = BlogIt.CompressedTransport.stats
+    assert stats['received'] == stats['received_raw']
+
+
+def test_listing_without_wp_getPosts(wordpress_client, xmlrpc_server):
+    fields = BlogIt.MetaWeblogPostListingPosts(None).id_date_title_tags
+    posts = wordpress_client.get_posts('text', fields)
+    assert [sorted(p) for p in posts] == 20 * [sorted(fields)]
+    assert posts[3]['title'] == 'Post 3'
+    assert wordpress_client.get_posts('text')[3] == RECENT_POSTS[3]
+    # The missing method is only asked for once.
+    wordpress_client.get_posts('text', fields)
+    assert xmlrpc_server.calls.count('wp.getPosts') == 1
+
+
+def test_listing_wp_getPosts_fault(wordpress_client, xmlrpc_server):
+
+    def bad_login(*args):
+        raise Fault(403, 'Incorrect username or password.')
+    xmlrpc_server.register_function(bad_login, 'wp.getPosts')
+    fields = BlogIt.MetaWeblogPostListingPosts(None).id_date_title_tags
+    e = py.test.raises(Fault, wordpress_client.get_posts, 'text', fields)
+    assert e.value.faultCode == 403
+    assert 'metaWeblog.getRecentPosts' not in xmlrpc_server.calls
+
+
+def test_listing_with_wp_getPosts(wordpress_client, xmlrpc_server,
+                                  monkeypatch):
+    xmlrpc_server.register_function(get_posts, 'wp.getPosts')
+    monkeypatch.setattr(BlogIt.CompressedTransport, 'stats',
+                        dict.fromkeys(BlogIt.CompressedTransport.stats, 0))
+    fields = BlogIt.MetaWeblogPostListingPosts(None).id_date_title_tags
+    posts = wordpress_client.get_posts('text', fields)
+    assert posts[3] == dict((f, RECENT_POSTS[3][f]) for f in fields)
+    assert BlogIt.CompressedTransport.stats['received_raw'] < 20 * 10000
+
+
+def pytest_funcarg__breakers(request):
+    monkeypatch = request.getfuncargvalue('monkeypatch')
+    monkeypatch.setattr(BlogIt.CallPolicy, 'breakers', {})
+    monkeypatch.setattr(BlogIt.CallPolicy, 'MAX_BACKOFF', 0)
+    return BlogIt.CallPolicy.breakers
+
+
+def test_reading_call_is_retried(xmlrpc_server, xmlrpc_url, breakers):
+    xmlrpc_server.failures = 2
+    proxy = BlogIt.CompressedTransport.server_proxy(xmlrpc_url, retries=2)
+    assert proxy.metaWeblog.getRecentPosts('', 'user', 'password')
+    assert breakers == {}
+
+
+def test_writing_call_is_not_retried(xmlrpc_server, xmlrpc_url, breakers):
+    xmlrpc_server.failures = 1
+    proxy = BlogIt.CompressedTransport.server_proxy(xmlrpc_url, retries=2)
+    py.test.raises(ProtocolError, proxy.size, 'x')
+    assert proxy.size('x') == 1
+
+
+def test_read_timeout(xmlrpc_url, breakers):
+    proxy = BlogIt.CompressedTransport.server_proxy(xmlrpc_url,
+                                                    timeout=(1, 0.2))
+    start = time.time()
+    py.test.raises(socket.timeout, proxy.sleep, 1)
+    assert time.time() - start < 0.8
+
+
+def test_circuit_breaker(xmlrpc_server, xmlrpc_url, breakers, monkeypatch):
+    xmlrpc_server.failures = BlogIt.CallPolicy.BREAKER_FAILURES
+    proxy = BlogIt.CompressedTransport.server_proxy(xmlrpc_url, retries=10)
+    py.test.raises(BlogIt.ServerUnavailableException,
+                   proxy.metaWeblog.getRecentPosts, '', 'user', 'password')
+    assert xmlrpc_server.failures == 0
+    py.test.raises(BlogIt.ServerUnavailableException, proxy.size, 'x')
+    monkeypatch.setattr(BlogIt.CallPolicy, 'BREAKER_COOLDOWN', 0)
+    assert proxy.size('x') == 1
+    assert breakers == {}
+
+
+def test_prefetched_posts_are_fetched_once(xmlrpc_server, xmlrpc_url,
+                                           wordpress_client):
+    calls = []
+
+    def get_post(post_id, username, password):
+        calls.append(post_id)
+        return {'postid': post_id, 'post_status': 'publish'}
+    xmlrpc_server.register_function(get_post, 'metaWeblog.getPost')
+    xmlrpc_server.register_function(lambda blog_id, username, password,
+                                        post_id: {'total_comments': 0},
+                                    'wp.getCommentCount')
+    wordpress_client.vim_vars.blog_name = 'blogit'
+
+    def post(post_id):
+        client = BlogIt.CompressedTransport.server_proxy(xmlrpc_url)
+        return BlogIt.WordPressBlogPost(post_id, client=client,
+                                        vim_vars=wordpress_client.vim_vars)
+    prefetcher = BlogIt.Prefetcher()
+    prefetcher.want([post(str(i)) for i in range(5)])
+    for i in range(5):
+        p = post(str(i))
+        prefetcher.getPost(p)
+        assert p.post_data['postid'] == str(i)
+    assert sorted(calls) == [str(i) for i in range(5)]
+
+
+def test_batch_publisher(xmlrpc_server, xmlrpc_url, tmpdir, monkeypatch):
+    posts = {}
+
+    def new_post(blog_id, username, password, post, publish):
+        post_id = str(len(posts) + 1)
+        posts[post_id] = dict(post, postid=post_id)
+        return post_id
+
+    def edit_post(post_id, username, password, post, publish):
+        posts[post_id].update(post)
+        return True
+    failing_gets = []
+
+    def get_post(post_id, username, password):
+        if failing_gets:
+            failing_gets.pop()
+            raise Fault(500, 'Internal error')
+        return posts[post_id]
+    xmlrpc_server.register_function(new_post, 'metaWeblog.newPost')
+    xmlrpc_server.register_function(edit_post, 'metaWeblog.editPost')
+    xmlrpc_server.register_function(get_post, 'metaWeblog.getPost')
+    xmlrpc_server.register_function(lambda blog_id, username, password,
+                                        post_id: {'total_comments': 0},
+                                    'wp.getCommentCount')
+    headless = BlogIt.HeadlessVim({'blogit_url': xmlrpc_url,
+                                   'blogit_username': 'user',
+                                   'blogit_password': 'password',
+                                   'blogit_media_index':
+                                        str(tmpdir.join('media.json'))})
+    monkeypatch.setattr(blogit, 'vim', headless)
+    for i in range(20):
+        tmpdir.join('posts', '%02d.md' % i).write('# Post %d\n\nText %d\n' %
+                                                  (i, i), ensure=True)
+    paths = sorted(str(p) for p in tmpdir.join('posts').listdir())
+    log = str(tmpdir.join('push.log'))
+
+    def publish(push=1, failed=0):
+        publisher = BlogIt.BatchPublisher(BlogIt.VimVars(), log, push,
+                                          jobs=4, out=StringIO())
+        assert publisher.publish(paths) == failed
+        return publisher.counts
+
+    assert publish()['created'] == 20
+    assert sorted(p['title'] for p in posts.values()) == sorted(
+            'Post %d' % i for i in range(20))
+    assert publish()['unchanged'] == 20
+    tmpdir.join('posts', '07.md').write('# Post 7\n\nChanged\n')
+    counts = publish()
+    assert (counts['updated'], counts['unchanged']) == (1, 19)
+    assert len(posts) == 20
+    assert [p for p in posts.values() if p['title'] == 'Post 7'
+            ][0]['description'] == 'Changed'
+    assert publish(push=0)['updated'] == 20
+    assert set(p['post_status'] for p in posts.values()) == set(['draft'])
+    # Created, but the run stopped before the post was read back.
+    tmpdir.join('posts', '20.md').write('# Post 20\n\nText 20\n')
+    paths.append(str(tmpdir.join('posts', '20.md')))
+    failing_gets.append(True)
+    assert publish(push=0, failed=1)['created'] == 0
+    assert len(posts) == 21
+    monkeypatch.chdir(tmpdir)
+    paths = [os.path.relpath(path) for path in paths]
+    counts = publish(push=0)
+    assert (counts['updated'], counts['unchanged']) == (1, 20)
+    assert len(posts) == 21
+
+
+def test_media_upload_is_streamed(xmlrpc_server, xmlrpc_url, tmpdir,
+                                  monkeypatch):
+    received = []
+
+    def new_media_object(blog_id, username, password, data):
+        received.append(data['bits'].data)
+        return {'url': 'http://example.com/%s' % data['name']}
+    xmlrpc_server.register_function(new_media_object,
+                                    'metaWeblog.newMediaObject')
+    sent = []
+    send = blogit.httplib.HTTPConnection.send
+    monkeypatch.setattr(blogit.httplib.HTTPConnection, 'send',
+                        lambda self, data: sent.append(len(data)) or
+                                           send(self, data))
+    content = os.urandom(2 * 1024 * 1024 + 5)
+    tmpdir.join('big.png').write(content, 'wb')
+    vim_vars = Mock('VimVars', tracker=None)
+    vim_vars.blog_url = xmlrpc_url
+    vim_vars.blog_username = 'user'
+    vim_vars.blog_password = 'password'
+    vim_vars.blog_compress = 1
+    vim_vars.blog_timeout = (10.0, 60.0)
+    vim_vars.blog_media_index = str(tmpdir.join('media.json'))
+    vim_vars.blog_upload_jobs = 1
+    uploader = BlogIt.MediaUploader(vim_vars, str(tmpdir))
+    media = BlogIt.MediaFile(str(tmpdir.join('big.png')))
+    assert uploader.upload_file(media) == 'http://example.com/big.png'
+    assert received == [content]
+    assert max(sent) < 100 * 1024
+
+
+def test_batch_publisher_uploads_shared_image_once(xmlrpc_server, xmlrpc_url,
+                                                   tmpdir, monkeypatch):
+    uploads = []
+
+    def new_media_object(blog_id, username, password, data):
+        uploads.append(data['name'])
+        time.sleep(0.2)    # Let the other workers find the same image.
+        return {'url': 'http://example.com/%s' % data['name']}
+    xmlrpc_server.register_function(new_media_object,
+                                    'metaWeblog.newMediaObject')
+    xmlrpc_server.register_function(lambda blog_id, username, password,
+                                        post, publish: '1',
+                                    'metaWeblog.newPost')
+    xmlrpc_server.register_function(lambda post_id, username, password:
+                                        {'postid': '1', 'post_status': 'draft'},
+                                    'metaWeblog.getPost')
+    xmlrpc_server.register_function(lambda blog_id, username, password,
+                                        post_id: {'total_comments': 0},
+                                    'wp.getCommentCount')
+    index_path = tmpdir.join('media.json')
+    monkeypatch.setattr(blogit, 'vim', BlogIt.HeadlessVim({
+            'blogit_url': xmlrpc_url, 'blogit_username': 'user',
+            'blogit_password': 'password',
+            'blogit_media_index': str(index_path)}))
+    tmpdir.join('posts', 'logo.png').write('PNG', ensure=True)
+    for i in range(16):
+        tmpdir.join('posts', '%02d.md' % i).write('![logo](logo.png)\n')
+    paths = sorted(str(p) for p in tmpdir.join('posts').listdir('*.md'))
+    publisher = BlogIt.BatchPublisher(BlogIt.VimVars(),
+                                      str(tmpdir.join('push.log')), jobs=8,
+                                      out=StringIO())
+    assert publisher.publish(paths) == 0
+    assert uploads == ['logo.png']
+    assert BlogIt.MediaIndex(str(index_path)).urls.values() == [
+            'http://example.com/logo.png']